@@ -11,116 +11,355 @@ This version includes improved error handling for service name conflicts.
 Author: Converted for ArcGIS Online Integration
 """
 
-import urllib.request
 import certifi
-import ssl
-import sys
+import functools
 import datetime
+import time
 import traceback
-import json
-import pandas as pd
-import tempfile
-import os
-import uuid
-from arcgis.gis import GIS
-from arcgis.features import FeatureLayer
+import numpy as np
+import struct
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
 import urllib3
+from urllib3.util.retry import Retry
 
 # Suppress InsecureRequestWarning for cleaner output in Notebooks
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-# Install gtfs-realtime-bindings if not available
+# Optional fast JSON encoder: orjson formats floats/ints in C several times
+# faster than stdlib json, which dominates CPU when serializing thousands
+# of feature dicts for applyEdits. Missing orjson just means the arcgis
+# library's normal encoding path is used.
 try:
-    from google.transit import gtfs_realtime_pb2
-    print("✓ Using gtfs-realtime-bindings for parsing")
+    import orjson
 except ImportError:
-    print("Installing gtfs-realtime-bindings...")
-    import subprocess
-    subprocess.check_call([sys.executable, '-m', 'pip', 'install', 'gtfs-realtime-bindings'])
-    from google.transit import gtfs_realtime_pb2
-    print("✓ gtfs-realtime-bindings installed and imported")
+    orjson = None
 
 # --- Configuration Constants ---
 FEATURE_LAYER_NAME = "Adelaide_Metro_Vehicles"
 GTFS_URL = "https://gtfs.adelaidemetro.com.au/v1/realtime/vehicle_positions"
 
-# === GTFS-RT Bindings Parser ===
-def parse_with_bindings(feed_data):
-    """Parse GTFS-RT data using official bindings."""
-    feed = gtfs_realtime_pb2.FeedMessage()
-    feed.ParseFromString(feed_data)
-    vehicles = []
+# Features per applyEdits request: keeps each request under AGOL's size
+# limits, and chunks can be submitted in parallel
+EDIT_BATCH_SIZE = 1000
+
+# One shared spatial-reference dict reused by every feature geometry; the
+# AGOL REST API is fine with the repeated reference
+SR_WGS84 = {"wkid": 4326}
+
+# Shared HTTP session: keep-alive plus a small connection pool means repeat
+# polls reuse the open TCP/TLS connection instead of handshaking every time
+SESSION = requests.Session()
+SESSION.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=10,
+                                      max_retries=Retry(total=3, backoff_factor=0.3)))
+
+# Resolve the certifi CA bundle once at import and pin it on the session.
+# Passing verify=certifi.where() per call made urllib3 rebuild the SSL
+# context (re-reading ~200 KB of PEM) for every fetch; configured on the
+# session, the context is created once and TLS session resumption can
+# shorten subsequent handshakes.
+SESSION.verify = certifi.where()
+
+# Column names for the parser output. The parser returns a Struct-of-Arrays
+# dict — one list per field, all the same length — instead of one dict per
+# vehicle, so pandas and downstream loops see typed columns directly.
+VEHICLE_FIELDS = (
+    'vehicle_id', 'vehicle_label', 'license_plate',
+    'trip_id', 'route_id', 'direction_id', 'start_time', 'start_date',
+    'latitude', 'longitude', 'bearing', 'speed',
+    'current_stop_id', 'position_timestamp', 'last_updated'
+)
+
+# === Embedded GTFS-RT Protobuf Parser ===
+#
+# Hand-written decoder for GTFS-RT VehiclePosition messages, same pattern as
+# the ArcGIS Pro embedded parser. Only the fields this script publishes are
+# decoded; everything else is skipped by wire type. This removes the
+# protobuf runtime entirely: no FeedMessage object tree is built for fields
+# we ignore, and there is no pip install of gtfs-realtime-bindings at
+# startup.
+
+class _ProtoReader:
+    """Low-level reader for Protocol Buffers binary format."""
+
+    __slots__ = ("data", "i", "n")
+
+    def __init__(self, data):
+        self.data = data
+        self.i = 0
+        self.n = len(data)
+
+    def eof(self):
+        return self.i >= self.n
+
+    def _require(self, count):
+        if self.i + count > self.n:
+            raise ValueError("Truncated protobuf message")
+        start = self.i
+        self.i += count
+        return start
+
+    def read_varint(self):
+        """Read a protobuf varint (up to 64 bits)."""
+        result = 0
+        shift = 0
+        while True:
+            if self.i >= self.n:
+                raise ValueError("Truncated varint")
+            b = self.data[self.i]
+            self.i += 1
+            result |= (b & 0x7F) << shift
+            if not (b & 0x80):
+                return result
+            shift += 7
+            if shift >= 64:
+                raise ValueError("Varint too long")
+
+    def read_bytes(self, length):
+        start = self._require(length)
+        return self.data[start:start + length]
+
+    def read_float(self):
+        start = self._require(4)
+        return struct.unpack("<f", self.data[start:start + 4])[0]
+
+    def skip_field(self, wire_type):
+        """Skip a field with the given wire type."""
+        if wire_type == 0:        # varint
+            _ = self.read_varint()
+        elif wire_type == 1:      # 64-bit
+            _ = self.read_bytes(8)
+        elif wire_type == 2:      # length-delimited
+            length = self.read_varint()
+            _ = self.read_bytes(length)
+        elif wire_type == 5:      # 32-bit
+            _ = self.read_bytes(4)
+        else:
+            raise ValueError(f"Unsupported protobuf wire type: {wire_type}")
+
+
+def _parse_trip_descriptor(data):
+    """Parse TripDescriptor: trip_id (1), start_time (2), start_date (3) and
+    route_id (5) strings plus direction_id (6, uint32)."""
+    r = _ProtoReader(data)
+    trip_id = route_id = direction_id = start_time = start_date = None
+
+    while not r.eof():
+        tag = r.read_varint()
+        field = tag >> 3
+        wt = tag & 0x07
+
+        if wt == 2 and field in (1, 2, 3, 5):
+            length = r.read_varint()
+            s = r.read_bytes(length).decode("utf-8", "ignore")
+            if field == 1:
+                trip_id = s
+            elif field == 2:
+                start_time = s
+            elif field == 3:
+                start_date = s
+            else:
+                route_id = s
+        elif wt == 0 and field == 6:
+            direction_id = r.read_varint()
+        else:
+            r.skip_field(wt)
+
+    return trip_id, route_id, direction_id, start_time, start_date
+
+
+def _parse_vehicle_descriptor(data):
+    """Parse VehicleDescriptor: id (1), label (2), license_plate (3)."""
+    r = _ProtoReader(data)
+    vehicle_id = vehicle_label = license_plate = None
 
-    for entity in feed.entity:
-        if entity.HasField('vehicle'):
-            vehicle_data = {}
-            vehicle_pos = entity.vehicle
+    while not r.eof():
+        tag = r.read_varint()
+        field = tag >> 3
+        wt = tag & 0x07
 
-            if vehicle_pos.HasField('vehicle'):
-                vehicle_desc = vehicle_pos.vehicle
-                vehicle_data['vehicle_id'] = vehicle_desc.id if vehicle_desc.id else None
-                vehicle_data['vehicle_label'] = vehicle_desc.label if vehicle_desc.label else None
-                vehicle_data['license_plate'] = vehicle_desc.license_plate if vehicle_desc.license_plate else None
+        if wt == 2 and field in (1, 2, 3):
+            length = r.read_varint()
+            s = r.read_bytes(length).decode("utf-8", "ignore")
+            if field == 1:
+                vehicle_id = s
+            elif field == 2:
+                vehicle_label = s
+            else:
+                license_plate = s
+        else:
+            r.skip_field(wt)
+
+    return vehicle_id, vehicle_label, license_plate
 
-            if vehicle_pos.HasField('trip'):
-                trip_desc = vehicle_pos.trip
-                vehicle_data['trip_id'] = trip_desc.trip_id if trip_desc.trip_id else None
-                vehicle_data['route_id'] = trip_desc.route_id if trip_desc.route_id else None
-                vehicle_data['direction_id'] = trip_desc.direction_id if trip_desc.HasField('direction_id') else None
-                vehicle_data['start_time'] = trip_desc.start_time if trip_desc.start_time else None
-                vehicle_data['start_date'] = trip_desc.start_date if trip_desc.start_date else None
 
-            if vehicle_pos.HasField('position'):
-                pos = vehicle_pos.position
-                vehicle_data['latitude'] = pos.latitude
-                vehicle_data['longitude'] = pos.longitude
-                vehicle_data['bearing'] = pos.bearing if pos.HasField('bearing') else None
-                vehicle_data['speed'] = pos.speed if pos.HasField('speed') else None
+def _parse_position(data):
+    """Parse Position: latitude (1), longitude (2), bearing (3), speed (5)."""
+    r = _ProtoReader(data)
+    latitude = longitude = bearing = speed = None
 
-            vehicle_data['current_stop_id'] = vehicle_pos.stop_id if vehicle_pos.stop_id else None
+    while not r.eof():
+        tag = r.read_varint()
+        field = tag >> 3
+        wt = tag & 0x07
 
-            if vehicle_pos.HasField('timestamp'):
-                vehicle_data['position_timestamp'] = datetime.datetime.fromtimestamp(vehicle_pos.timestamp)
+        if wt == 5 and field == 1:
+            latitude = r.read_float()
+        elif wt == 5 and field == 2:
+            longitude = r.read_float()
+        elif wt == 5 and field == 3:
+            bearing = r.read_float()
+        elif wt == 5 and field == 5:
+            speed = r.read_float()
+        else:
+            r.skip_field(wt)
+
+    return latitude, longitude, bearing, speed
+
+
+def _parse_vehicle_position(data, cols):
+    """Parse one VehiclePosition message and append it as a new row across
+    the output columns."""
+    r = _ProtoReader(data)
+    trip_id = route_id = direction_id = start_time = start_date = None
+    vehicle_id = vehicle_label = license_plate = None
+    latitude = longitude = bearing = speed = None
+    current_stop_id = None
+    timestamp = None
+
+    while not r.eof():
+        tag = r.read_varint()
+        field = tag >> 3
+        wt = tag & 0x07
+
+        if field == 1 and wt == 2:      # trip (TripDescriptor)
+            length = r.read_varint()
+            trip_id, route_id, direction_id, start_time, start_date = \
+                _parse_trip_descriptor(r.read_bytes(length))
+        elif field == 8 and wt == 2:    # vehicle (VehicleDescriptor)
+            length = r.read_varint()
+            vehicle_id, vehicle_label, license_plate = \
+                _parse_vehicle_descriptor(r.read_bytes(length))
+        elif field == 2 and wt == 2:    # position (Position)
+            length = r.read_varint()
+            latitude, longitude, bearing, speed = _parse_position(r.read_bytes(length))
+        elif field == 7 and wt == 2:    # stop_id (string)
+            length = r.read_varint()
+            current_stop_id = r.read_bytes(length).decode("utf-8", "ignore")
+        elif field == 5 and wt == 0:    # timestamp (uint64)
+            timestamp = r.read_varint()
+        else:
+            r.skip_field(wt)
+
+    cols['vehicle_id'].append(vehicle_id)
+    cols['vehicle_label'].append(vehicle_label)
+    cols['license_plate'].append(license_plate)
+    cols['trip_id'].append(trip_id)
+    cols['route_id'].append(route_id)
+    cols['direction_id'].append(direction_id)
+    cols['start_time'].append(start_time)
+    cols['start_date'].append(start_date)
+    cols['latitude'].append(latitude)
+    cols['longitude'].append(longitude)
+    cols['bearing'].append(bearing)
+    cols['speed'].append(speed)
+    cols['current_stop_id'].append(current_stop_id)
+    # Raw epoch seconds straight from the feed; converted to epoch-ms in
+    # bulk downstream instead of allocating a datetime per vehicle here
+    cols['position_timestamp'].append(timestamp)
+
+
+def _parse_feed_entity_vehicle(data, cols):
+    """Parse a FeedEntity; field 4 is the VehiclePosition we care about."""
+    r = _ProtoReader(data)
+
+    while not r.eof():
+        tag = r.read_varint()
+        field = tag >> 3
+        wt = tag & 0x07
+
+        if field == 4 and wt == 2:
+            length = r.read_varint()
+            _parse_vehicle_position(r.read_bytes(length), cols)
+        else:
+            r.skip_field(wt)
 
-            vehicle_data['last_updated'] = datetime.datetime.now()
 
-            vehicles.append(vehicle_data)
+def parse_vehicle_positions(feed_data):
+    """Parse a GTFS-RT FeedMessage into per-field columns.
 
-    return vehicles
+    Replacement for the old gtfs-realtime-bindings parser: walks the feed
+    with the embedded tag-dispatch reader, appending each VehiclePosition
+    directly into the Struct-of-Arrays column dict. The header and any
+    non-vehicle entities are skipped without being materialized.
+    """
+    r = _ProtoReader(feed_data)
+    cols = {name: [] for name in VEHICLE_FIELDS}
+
+    while not r.eof():
+        try:
+            tag = r.read_varint()
+        except ValueError:
+            break  # defensive break on a truncated feed
+
+        field = tag >> 3
+        wt = tag & 0x07
+
+        if field == 2 and wt == 2:      # entity (FeedEntity)
+            length = r.read_varint()
+            _parse_feed_entity_vehicle(r.read_bytes(length), cols)
+        else:
+            r.skip_field(wt)
+
+    # All vehicles in one batch share the same "fetched at" time, so take
+    # the clock reading once instead of once per vehicle in the hot loop
+    cols['last_updated'] = [datetime.datetime.now()] * len(cols['vehicle_id'])
+
+    return cols
 
 # === Data Fetching and Parsing ===
 def fetch_and_parse_gtfs_data(gtfs_url):
     """Fetch and parse GTFS-RT data."""
     print(f"Fetching data from: {gtfs_url}")
     try:
-        context = ssl.create_default_context(cafile=certifi.where())
-        request = urllib.request.Request(
+        # Ask for a gzipped body explicitly — protobuf varints compress to
+        # roughly a third of their size and requests decompresses for us
+        response = SESSION.get(
             gtfs_url,
-            headers={'User-Agent': 'ArcGIS Online Notebook GTFS-RT Client'}
+            timeout=30,
+            headers={'User-Agent': 'ArcGIS Online Notebook GTFS-RT Client',
+                     'Accept-Encoding': 'gzip, deflate'}
         )
-        with urllib.request.urlopen(request, context=context, timeout=30) as response:
-            feed_data = response.read()
+        response.raise_for_status()
+        feed_data = response.content
         print("Data fetched successfully. Parsing...")
-        vehicles = parse_with_bindings(feed_data)
-        print(f"Parsed {len(vehicles)} vehicles from feed")
+        vehicles = parse_vehicle_positions(feed_data)
+        print(f"Parsed {len(vehicles['vehicle_id'])} vehicles from feed")
         return vehicles
     except Exception as e:
         print(f"Error fetching/parsing data: {str(e)}")
         print(f"Full traceback: {traceback.format_exc()}")
-        return []
+        return {name: [] for name in VEHICLE_FIELDS}
 
-def validate_and_filter_positions(vehicles):
+def validate_and_filter_positions(cols):
     """Validate coordinates for Adelaide region."""
-    valid_vehicles = []
-    for vehicle in vehicles:
-        latitude = vehicle.get('latitude')
-        longitude = vehicle.get('longitude')
-        if latitude is not None and longitude is not None:
-            if -36.5 <= latitude <= -33.5 and 137.5 <= longitude <= 140.5:
-                valid_vehicles.append(vehicle)
-    print(f"Found {len(valid_vehicles)} valid vehicles within Adelaide bounds.")
-    return valid_vehicles
-
+    # One vectorized compare over contiguous float64 arrays instead of a
+    # Python loop with four compares per row; None becomes NaN and fails
+    # every comparison, so positionless vehicles drop out automatically.
+    lat = np.array(cols['latitude'], dtype=np.float64)
+    lon = np.array(cols['longitude'], dtype=np.float64)
+    mask = ((lat >= -36.5) & (lat <= -33.5) &
+            (lon >= 137.5) & (lon <= 140.5) &
+            ~np.isnan(lat) & ~np.isnan(lon))
+    keep = np.flatnonzero(mask)
+    valid_cols = {name: [values[i] for i in keep] for name, values in cols.items()}
+    print(f"Found {len(keep)} valid vehicles within Adelaide bounds.")
+    return valid_cols
+
+# A feed has ~2000 vehicles but only ~200 distinct routes, so most calls
+# repeat a route_id already seen; the cache also persists across polls.
+@functools.lru_cache(maxsize=1024)
 def classify_vehicle_type(route_id):
     """Classify vehicle type based on RouteID patterns."""
     if not route_id:
@@ -140,13 +379,35 @@ def classify_vehicle_type(route_id):
     return "Bus"
 
 # === Enhanced ArcGIS Online Feature Layer Management ===
-def find_existing_service(gis, service_name):
+def service_name_available(gis, service_name):
+    """Check if a feature service name is free with one lightweight REST call.
+
+    portals/self/isServiceNameAvailable is a direct lookup, far cheaper than
+    a full content search (which runs a catalog query server-side), so the
+    common no-conflict case costs a single small round-trip.
+    """
+    try:
+        result = gis._portal.con.post(
+            'portals/self/isServiceNameAvailable',
+            {'name': service_name, 'type': 'Feature Service', 'f': 'json'}
+        )
+        return bool(result.get('available'))
+    except Exception as e:
+        print(f"Error checking service name availability: {e}")
+        # Fall back to assuming a conflict so callers take the safe path
+        return False
+
+def find_existing_service(gis, service_name, username=None):
     """Find any existing service (Feature Layer, Map Service, etc.) by name."""
     try:
         print(f"Searching for existing services with name: {service_name}")
         
-        # Search for any content with this name owned by the current user
-        search_results = gis.content.search(f'title:"{service_name}" AND owner:{gis.users.me.username}')
+        # Search for any content with this name owned by the current user.
+        # Callers that already know the username pass it in so we do not
+        # re-fetch the users/me resource for every search.
+        if username is None:
+            username = gis.users.me.username
+        search_results = gis.content.search(f'title:"{service_name}" AND owner:{username}')
         
         if search_results:
             print(f"Found {len(search_results)} item(s) with matching name:")
@@ -192,19 +453,34 @@ def delete_conflicting_services(gis, service_name):
         print(f"Error during cleanup: {e}")
         return False
 
-def find_existing_feature_layer(gis, layer_name):
-    """Find existing feature layer by name and type."""
+def _post_adds_fast(feature_layer, adds):
+    """POST adds straight to <layer>/applyEdits with orjson serialization.
+
+    Bypasses the arcgis library's stdlib-json encode of the feature payload,
+    reusing the library's authenticated session for the request itself.
+    Returns the parsed applyEdits result dict, or None on any failure so the
+    caller can fall back to the regular edit_features path.
+    """
+    if orjson is None:
+        return None
     try:
-        search_results = gis.content.search(f'title:"{layer_name}" AND owner:{gis.users.me.username} AND type:"Feature Layer"')
-        if search_results:
-            # Return the first Feature Layer found
-            for item in search_results:
-                if item.type == "Feature Layer":
-                    return item
-    except Exception as e:
-        print(f"Error searching for existing feature layer: {e}")
-        print(f"Full traceback: {traceback.format_exc()}")
-    return None
+        con = feature_layer._con
+        payload = {
+            'f': 'json',
+            'adds': orjson.dumps(adds).decode(),
+        }
+        token = getattr(con, 'token', None)
+        if token:
+            payload['token'] = token
+        response = con._session.post(feature_layer.url + '/applyEdits',
+                                     data=payload, timeout=60)
+        response.raise_for_status()
+        result = response.json()
+        if 'error' in result:
+            return None
+        return result
+    except Exception:
+        return None
 
 def update_existing_layer(layer_item, vehicles_data):
     """Update an existing feature layer with new vehicle data."""
@@ -212,47 +488,77 @@ def update_existing_layer(layer_item, vehicles_data):
         print(f"Updating existing layer: {layer_item.title}")
         feature_layer = layer_item.layers[0]
 
-        # Convert vehicle data to features
+        # Vectorize the timestamp math: the parser stores raw feed epoch
+        # seconds, so one NumPy multiply converts the whole column to epoch
+        # milliseconds, and a single shared LastUpdated replaces N
+        # datetime.timestamp() calls (one per vehicle) in the loop below.
+        ts_sec = np.array(vehicles_data['position_timestamp'], dtype=np.float64)
+        has_ts = ~np.isnan(ts_sec)
+        position_ts_ms = np.full(len(ts_sec), None, dtype=object)
+        position_ts_ms[has_ts] = (ts_sec[has_ts] * 1000).astype(np.int64).tolist()
+        position_ts_ms = position_ts_ms.tolist()
+        last_updated_ms = int(time.time() * 1000)
+
+        # Convert vehicle columns to features in one zipped pass: tuple
+        # unpacking replaces ~14 per-row column[i] lookups per feature
         features = []
-        for vehicle in vehicles_data:
-            if vehicle.get('latitude') is not None and vehicle.get('longitude') is not None:
-                attributes = {
-                    "VehicleID": vehicle.get('vehicle_id'),
-                    "VehicleLabel": vehicle.get('vehicle_label'),
-                    "LicensePlate": vehicle.get('license_plate'),
-                    "TripID": vehicle.get('trip_id'),
-                    "RouteID": vehicle.get('route_id'),
-                    "DirectionID": vehicle.get('direction_id'),
-                    "StartTime": vehicle.get('start_time'),
-                    "StartDate": vehicle.get('start_date'),
-                    "Bearing": vehicle.get('bearing'),
-                    "Speed": vehicle.get('speed'),
-                    "CurrentStopID": vehicle.get('current_stop_id'),
-                    "PositionTimestamp": int(vehicle['position_timestamp'].timestamp() * 1000) if vehicle.get('position_timestamp') else None,
-                    "LastUpdated": int(vehicle['last_updated'].timestamp() * 1000),
-                    "VehicleType": classify_vehicle_type(vehicle.get('route_id'))
+        rows = zip(vehicles_data['vehicle_id'], vehicles_data['vehicle_label'],
+                   vehicles_data['license_plate'], vehicles_data['trip_id'],
+                   vehicles_data['route_id'], vehicles_data['direction_id'],
+                   vehicles_data['start_time'], vehicles_data['start_date'],
+                   vehicles_data['latitude'], vehicles_data['longitude'],
+                   vehicles_data['bearing'], vehicles_data['speed'],
+                   vehicles_data['current_stop_id'], position_ts_ms)
+        for (vehicle_id, vehicle_label, license_plate, trip_id, route_id,
+             direction_id, start_time, start_date, latitude, longitude,
+             bearing, speed, current_stop_id, ts_ms) in rows:
+            if latitude is None or longitude is None:
+                continue
+            features.append({
+                "geometry": {
+                    "x": longitude,
+                    "y": latitude,
+                    "spatialReference": SR_WGS84
+                },
+                "attributes": {
+                    "VehicleID": vehicle_id,
+                    "VehicleLabel": vehicle_label,
+                    "LicensePlate": license_plate,
+                    "TripID": trip_id,
+                    "RouteID": route_id,
+                    "DirectionID": direction_id,
+                    "StartTime": start_time,
+                    "StartDate": start_date,
+                    "Bearing": bearing,
+                    "Speed": speed,
+                    "CurrentStopID": current_stop_id,
+                    "PositionTimestamp": ts_ms,
+                    "LastUpdated": last_updated_ms,
+                    "VehicleType": classify_vehicle_type(route_id)
                 }
-                feature = {
-                    "geometry": {
-                        "x": vehicle['longitude'],
-                        "y": vehicle['latitude'],
-                        "spatialReference": {"wkid": 4326}
-                    },
-                    "attributes": attributes
-                }
-                features.append(feature)
+            })
 
-        # Use a single `truncate` and `add` operation for efficiency
+        # Use a single `truncate`, then push the adds in chunks. Multiple
+        # chunks are submitted concurrently so the client is not idle while
+        # AGOL processes each request server-side.
         print("Truncating existing features...")
         feature_layer.manager.truncate()
         print("Adding new features...")
-        add_result = feature_layer.edit_features(adds=features)
+        chunks = [features[i:i + EDIT_BATCH_SIZE] for i in range(0, len(features), EDIT_BATCH_SIZE)]
+        post_adds = lambda chunk: (_post_adds_fast(feature_layer, chunk)
+                                   or feature_layer.edit_features(adds=chunk))
+        if len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                results = list(executor.map(post_adds, chunks))
+        else:
+            results = [post_adds(chunk) for chunk in chunks]
 
-        add_count = len(add_result.get('addResults', []))
+        add_results = [r for result in results for r in result.get('addResults', [])]
+        add_count = len(add_results)
         print(f"Added {add_count} new features.")
 
         # Check for errors in the add operation
-        add_errors = [r for r in add_result.get('addResults', []) if not r['success']]
+        add_errors = [r for r in add_results if not r['success']]
         if add_errors:
             print(f"Errors occurred while adding features: {add_errors}")
             return False
@@ -264,119 +570,114 @@ def update_existing_layer(layer_item, vehicles_data):
         print(f"Full traceback: {traceback.format_exc()}")
         return False
 
-def create_feature_layer_with_unique_name(gis, vehicles_data, base_name):
-    """Create a new feature layer with a unique name if conflicts exist."""
-    temp_csv_item = None
-    try:
-        # Generate a unique service name
-        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-        unique_name = f"{base_name}_{timestamp}"
-        
-        print(f"Creating new hosted feature layer '{unique_name}' from {len(vehicles_data)} vehicles...")
-
-        # Convert to DataFrame
-        df = pd.DataFrame(vehicles_data)
-
-        # Clean and prepare data
-        df['PositionTimestamp'] = pd.to_datetime(df['position_timestamp'])
-        df['LastUpdated'] = pd.to_datetime(df['last_updated'])
-        df['VehicleType'] = df['route_id'].apply(classify_vehicle_type)
-
-        # Rename columns to match the schema
-        df = df.rename(columns={
-            'vehicle_id': 'VehicleID',
-            'vehicle_label': 'VehicleLabel',
-            'license_plate': 'LicensePlate',
-            'trip_id': 'TripID',
-            'route_id': 'RouteID',
-            'direction_id': 'DirectionID',
-            'start_time': 'StartTime',
-            'start_date': 'StartDate',
-            'bearing': 'Bearing',
-            'speed': 'Speed',
-            'current_stop_id': 'CurrentStopID'
-        })
-
-        # Filter out records without valid coordinates
-        df = df.dropna(subset=['longitude', 'latitude'])
-
-        # Use a temporary CSV file with a unique name
-        temp_dir = tempfile.gettempdir()
-        csv_filename = f"{unique_name}_{str(uuid.uuid4())[:8]}.csv"
-        csv_path = os.path.join(temp_dir, csv_filename)
-
-        # Save the dataframe to CSV
-        df.to_csv(csv_path, index=False)
-
-        # Set item properties with the unique layer name
-        item_properties = {
-            'title': unique_name,
-            'description': f'Adelaide Metro real-time vehicle positions - Created {datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")}',
-            'tags': 'Adelaide Metro, GTFS-RT, Real-time',
-            'type': 'CSV',
-            'typeKeywords': 'CSV, Location, GPS, RT'
-        }
+def create_feature_layer_with_schema(gis, base_name):
+    """Create an empty hosted feature service with the vehicle schema predeclared."""
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    unique_name = f"{base_name}_{timestamp}"
+
+    fields = [
+        {"name": "VehicleID", "type": "esriFieldTypeString", "alias": "Vehicle ID", "length": 50},
+        {"name": "VehicleLabel", "type": "esriFieldTypeString", "alias": "Vehicle Label", "length": 50},
+        {"name": "LicensePlate", "type": "esriFieldTypeString", "alias": "License Plate", "length": 50},
+        {"name": "TripID", "type": "esriFieldTypeString", "alias": "Trip ID", "length": 50},
+        {"name": "RouteID", "type": "esriFieldTypeString", "alias": "Route ID", "length": 50},
+        {"name": "DirectionID", "type": "esriFieldTypeInteger", "alias": "Direction ID"},
+        {"name": "StartTime", "type": "esriFieldTypeString", "alias": "Start Time", "length": 20},
+        {"name": "StartDate", "type": "esriFieldTypeString", "alias": "Start Date", "length": 20},
+        {"name": "Bearing", "type": "esriFieldTypeDouble", "alias": "Bearing"},
+        {"name": "Speed", "type": "esriFieldTypeDouble", "alias": "Speed"},
+        {"name": "CurrentStopID", "type": "esriFieldTypeString", "alias": "Current Stop ID", "length": 50},
+        {"name": "PositionTimestamp", "type": "esriFieldTypeDate", "alias": "Position Timestamp"},
+        {"name": "LastUpdated", "type": "esriFieldTypeDate", "alias": "Last Updated"},
+        {"name": "VehicleType", "type": "esriFieldTypeString", "alias": "Vehicle Type", "length": 20},
+    ]
+
+    layer_definition = {
+        "layers": [{
+            "name": unique_name,
+            "type": "Feature Layer",
+            "geometryType": "esriGeometryPoint",
+            "fields": fields,
+            "objectIdField": "OBJECTID",
+            "extent": {"xmin": 137.5, "ymin": -36.5, "xmax": 140.5, "ymax": -33.5,
+                       "spatialReference": {"wkid": 4326}},
+            "spatialReference": {"wkid": 4326},
+        }]
+    }
+
+    item_properties = {
+        "title": unique_name,
+        "type": "Feature Service",
+        "description": "Adelaide Metro real-time vehicle positions (schema defined)",
+        "tags": "Adelaide Metro, GTFS-RT, Real-time",
+    }
+
+    service_item = gis.content.create_service(
+        unique_name,
+        item_properties,
+        service_type="featureService",
+        create_params=layer_definition
+    )
+    return service_item
 
-        # Add the CSV as an item
-        temp_csv_item = gis.content.add(item_properties, data=csv_path)
-
-        # Publish the CSV as a feature layer with unique name
-        published_layer = temp_csv_item.publish(
-            publish_parameters={
-                'name': unique_name,
-                'locationType': 'coordinates',
-                'latitudeFieldName': 'latitude',
-                'longitudeFieldName': 'longitude'
-            }
-        )
-        
-        print(f"Created new hosted feature layer: {published_layer.title}")
-        print(f"Feature layer URL: {published_layer.url}")
-        
-        return published_layer, published_layer.layers[0]
+def create_feature_layer_with_unique_name(gis, vehicles_data, base_name):
+    """Create a new feature layer with a unique name if conflicts exist.
 
+    Creates an empty feature service with a predeclared schema and pushes the
+    features via applyEdits — one create call plus batched edits. The old
+    CSV write → upload → publish → delete pipeline is gone: no disk I/O, no
+    server-side schema inference, and no temporary item to clean up.
+    """
+    try:
+        service_item = create_feature_layer_with_schema(gis, base_name)
+        print(f"Created empty feature service: {service_item.title}")
+        if not update_existing_layer(service_item, vehicles_data):
+            print("Warning: service was created but the initial feature push failed.")
+        print(f"Feature layer URL: {service_item.url}")
+        return service_item, service_item.layers[0]
     except Exception as e:
         print(f"Error creating feature layer: {str(e)}")
         print(f"Full traceback: {traceback.format_exc()}")
         return None, None
-    finally:
-        # Cleanup temporary files and items
-        if 'csv_path' in locals() and os.path.exists(csv_path):
-            os.remove(csv_path)
-        if temp_csv_item:
-            temp_csv_item.delete()
 
 def main():
     """Main function with improved error handling."""
     try:
         print("Starting Adelaide GTFS-RT ArcGIS Online fetcher...")
 
-        # Connect to ArcGIS Online
+        # Connect to ArcGIS Online. arcgis is imported here, not at module
+        # top: it pulls in hundreds of ms of import time and tens of MB of
+        # RSS, which parse-only callers of this module never need.
         print("Connecting to ArcGIS Online...")
+        from arcgis.gis import GIS
         gis = GIS("home")
         print(f"Connected as: {gis.properties.user.username}")
 
         # Fetch and validate data
         vehicles = fetch_and_parse_gtfs_data(GTFS_URL)
-        if not vehicles:
+        if not vehicles['vehicle_id']:
             print("No vehicle data retrieved. Exiting.")
             return
 
         valid_vehicles = validate_and_filter_positions(vehicles)
-        if not valid_vehicles:
+        if not valid_vehicles['vehicle_id']:
             print("No valid vehicle data found. Exiting.")
             return
 
-        # Check for existing Feature Layer specifically
-        existing_layer = find_existing_feature_layer(gis, FEATURE_LAYER_NAME)
-        
-        # Also check if we should use the existing Feature Service found earlier
-        if not existing_layer:
-            # Look specifically for Feature Service type
-            feature_services = gis.content.search(f'title:"{FEATURE_LAYER_NAME}" AND owner:{gis.users.me.username} AND type:"Feature Service"')
-            if feature_services:
-                existing_layer = feature_services[0]
-                print(f"Found existing Feature Service to use: {existing_layer.title}")
+        # Fetch the signed-in username once and run a single catalog search,
+        # then partition the results in memory — main() used to issue up to
+        # three separate searches (Feature Layer, Feature Service, conflicts)
+        # for the same title
+        username = gis.users.me.username
+        items = gis.content.search(f'title:"{FEATURE_LAYER_NAME}" AND owner:{username}', max_items=50)
+        feature_layers = [item for item in items if item.type == "Feature Layer"]
+        feature_services = [item for item in items if item.type == "Feature Service"]
+
+        # Prefer a Feature Layer item; fall back to a bare Feature Service
+        existing_layer = feature_layers[0] if feature_layers else None
+        if not existing_layer and feature_services:
+            existing_layer = feature_services[0]
+            print(f"Found existing Feature Service to use: {existing_layer.title}")
 
         if existing_layer:
             print(f"Found existing Feature Layer: {existing_layer.title}")
@@ -390,21 +691,16 @@ def main():
         else:
             print("No existing Feature Layer found.")
             
-            # Check if there are any conflicting services and handle accordingly
-            conflicting_services = find_existing_service(gis, FEATURE_LAYER_NAME)
-            
-            if conflicting_services:
-                print(f"\nFound {len(conflicting_services)} conflicting service(s) with the same name.")
-                print("Options:")
-                print("1. Delete conflicting services and create new layer")
-                print("2. Create layer with timestamp suffix")
-                
+            # The search results already tell us about conflicts; only probe
+            # the REST availability endpoint when no items were found, to
+            # catch orphaned services that lack a catalog item
+            if items or not service_name_available(gis, FEATURE_LAYER_NAME):
+                print(f"\nService name '{FEATURE_LAYER_NAME}' is already taken.")
                 # For automation, we'll create with timestamp suffix
                 print("Creating layer with unique timestamp suffix...")
-                layer_item, feature_layer = create_feature_layer_with_unique_name(gis, valid_vehicles, FEATURE_LAYER_NAME)
             else:
                 print("No naming conflicts detected. Creating new layer...")
-                layer_item, feature_layer = create_feature_layer_with_unique_name(gis, valid_vehicles, FEATURE_LAYER_NAME)
+            layer_item, feature_layer = create_feature_layer_with_unique_name(gis, valid_vehicles, FEATURE_LAYER_NAME)
             
             if layer_item:
                 print("\n=== SUCCESS ===")
@@ -5,7 +5,11 @@ Version 6.8 - Fixed schema, robust retries, configurable cleanup,
               Jupyter-safe CLI, auto-README generator (fixed)
 """
 
-import urllib.request, certifi, ssl, sys, datetime as dt, time, traceback, argparse, os
+import urllib.request, certifi, ssl, sys, datetime as dt, time, traceback, argparse, os, json, tempfile, asyncio, random, gzip
+from urllib.parse import urlencode
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import pandas as pd
 from typing import List, Dict, Optional
 from arcgis.gis import GIS
 from arcgis.features import FeatureLayerCollection
@@ -13,7 +17,16 @@ import urllib3
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # async fetch path disabled; the urllib path is used instead
+
 # --- Dependencies ---
+# protobuf picks its fastest available backend on its own (cpp on 3.x, upb on
+# >=4.21); forcing PROTOCOL_BUFFERS_PYTHON_IMPLEMENTATION=cpp breaks imports on
+# modern protobuf where the cpp extension no longer ships. We only warn below
+# if the slow pure-Python backend ended up selected.
 try:
     from google.transit import gtfs_realtime_pb2
     print("✓ Using gtfs-realtime-bindings for parsing")
@@ -23,110 +36,255 @@ except ImportError:
     from google.transit import gtfs_realtime_pb2
     print("✓ Installed gtfs-realtime-bindings")
 
+try:
+    from google.protobuf.internal import api_implementation
+    if api_implementation.Type() not in ("cpp", "upb"):
+        print("⚠ protobuf is using its pure-Python backend; parsing will be slow (pip install 'protobuf>=4')")
+except Exception:
+    pass
+
 # --- Configuration ---
 FEATURE_LAYER_NAME = "Adelaide_Metro_Vehicles"
 GTFS_URL = "https://gtfs.adelaidemetro.com.au/v1/realtime/vehicle_positions"
 MAX_ADD_PER_REQUEST = 950
 KEEP_N = 3   # number of timestamped services to keep by default
+SR_WGS84 = {"wkid": 4326}
+
+# (source column, layer field) pairs for the scalar attributes
+FIELD_MAP = (("vehicle_id","VehicleID"), ("vehicle_label","VehicleLabel"), ("license_plate","LicensePlate"),
+             ("trip_id","TripID"), ("route_id","RouteID"), ("direction_id","DirectionID"),
+             ("start_time","StartTime"), ("start_date","StartDate"), ("bearing","Bearing"),
+             ("speed","Speed"), ("current_stop_id","CurrentStopID"))
 
 
 # === Helpers ===
 def utc_now() -> dt.datetime:
     return dt.datetime.now(dt.timezone.utc)
 
-def to_epoch_ms(d: Optional[dt.datetime]) -> Optional[int]:
-    if d is None: return None
-    if d.tzinfo is None: d = d.replace(tzinfo=dt.timezone.utc)
-    return int(d.timestamp() * 1000)
-
 def chunk(seq, size):
     for i in range(0, len(seq), size):
         yield seq[i:i + size]
 
 
 # === GTFS Parsing ===
-def parse_with_bindings(feed_data: bytes) -> List[Dict]:
+VEHICLE_COLUMNS = ("vehicle_id","vehicle_label","license_plate","trip_id","route_id","direction_id",
+                   "start_time","start_date","latitude","longitude","bearing","speed",
+                   "current_stop_id","position_timestamp_ms","last_updated")
+
+def parse_with_bindings(feed_data: bytes) -> pd.DataFrame:
+    """Parse the feed into one list per field (SoA) and return a DataFrame."""
     feed = gtfs_realtime_pb2.FeedMessage(); feed.ParseFromString(feed_data)
-    vehicles, feed_header_ts = [], None
-    if feed.header.HasField("timestamp"):
-        feed_header_ts = dt.datetime.fromtimestamp(feed.header.timestamp, tz=dt.timezone.utc)
+    cols = {name: [] for name in VEHICLE_COLUMNS}
+    # Hoist method/attribute lookups out of the entity loop; bind one append per column
+    (app_vid, app_vlabel, app_plate, app_tid, app_rid, app_did, app_stime, app_sdate,
+     app_lat, app_lon, app_bear, app_speed, app_stop, app_pts, app_upd) = (
+        cols[name].append for name in VEHICLE_COLUMNS)
+    # Keep timestamps as raw epoch ms — the publish path wants epoch ms anyway,
+    # so building N tz-aware datetimes just to convert back is wasted work
+    feed_header_ms = feed.header.timestamp * 1000 if feed.header.HasField("timestamp") else None
+    now = utc_now()  # one ingest time per feed — every row shares the same fetch moment
     for entity in feed.entity:
-        if entity.HasField("vehicle"):
-            v, vp = {}, entity.vehicle
-            if vp.HasField("vehicle"):
-                v["vehicle_id"], v["vehicle_label"], v["license_plate"] = (
-                    vp.vehicle.id or None, vp.vehicle.label or None, vp.vehicle.license_plate or None
-                )
-            if vp.HasField("trip"):
-                td = vp.trip
-                v["trip_id"], v["route_id"] = td.trip_id or None, td.route_id or None
-                try:
-                    v["direction_id"] = td.direction_id if td.HasField("direction_id") else None
-                except Exception:
-                    v["direction_id"] = getattr(td, "direction_id", None)
-                v["start_time"], v["start_date"] = td.start_time or None, td.start_date or None
-            if vp.HasField("position"):
-                pos = vp.position
-                v["latitude"], v["longitude"], v["bearing"], v["speed"] = (
-                    getattr(pos, "latitude", None),
-                    getattr(pos, "longitude", None),
-                    getattr(pos, "bearing", None),
-                    getattr(pos, "speed", None),
-                )
-            v["current_stop_id"] = vp.stop_id or None
-            v["position_timestamp"] = (
-                dt.datetime.fromtimestamp(vp.timestamp, tz=dt.timezone.utc)
-                if vp.HasField("timestamp") else feed_header_ts
-            )
-            v["last_updated"] = utc_now()
-            vehicles.append(v)
-    return vehicles
+        if not entity.HasField("vehicle"): continue
+        vp = entity.vehicle; has = vp.HasField
+        desc = vp.vehicle if has("vehicle") else None
+        td = vp.trip if has("trip") else None
+        pos = vp.position if has("position") else None
+        app_vid((desc.id or None) if desc else None)
+        app_vlabel((desc.label or None) if desc else None)
+        app_plate((desc.license_plate or None) if desc else None)
+        app_tid((td.trip_id or None) if td else None)
+        app_rid((td.route_id or None) if td else None)
+        if td is not None:
+            try: app_did(td.direction_id if td.HasField("direction_id") else None)
+            except Exception: app_did(getattr(td, "direction_id", None))
+        else: app_did(None)
+        app_stime((td.start_time or None) if td else None)
+        app_sdate((td.start_date or None) if td else None)
+        if pos is not None:
+            # Direct field access: protobuf scalar fields always exist (default 0.0)
+            app_lat(pos.latitude); app_lon(pos.longitude); app_bear(pos.bearing); app_speed(pos.speed)
+        else:
+            app_lat(None); app_lon(None); app_bear(None); app_speed(None)
+        app_stop(vp.stop_id or None)
+        app_pts(vp.timestamp * 1000 if has("timestamp") else feed_header_ms)
+        app_upd(now)
+    # Hand pandas pre-typed float arrays for the numeric columns so frame
+    # construction is O(cols) instead of sniffing every cell; string columns
+    # stay object so missing values remain plain None downstream.
+    n = len(cols["vehicle_id"])
+    for name in ("latitude", "longitude", "bearing", "speed"):
+        cols[name] = np.fromiter((np.nan if x is None else x for x in cols[name]), dtype=np.float64, count=n)
+    return pd.DataFrame(cols, copy=False)
 
 
 # === Fetch with retries ===
-def fetch_and_parse_gtfs_data(gtfs_url: str, max_retries: int = 4) -> List[Dict]:
+# Module-level TLS context and connection pool: the certifi CA bundle is parsed
+# once at import and the TCP+TLS connection is reused across polls instead of
+# paying a fresh handshake per fetch.
+_SSL_CTX = ssl.create_default_context(cafile=certifi.where())
+_HTTP = urllib3.PoolManager(ssl_context=_SSL_CTX, maxsize=4, retries=False)
+
+# Conditional-GET sidecar: remember the server's ETag/Last-Modified plus the last
+# parsed vehicles so an unchanged feed costs a 304 and zero body bytes.
+_FEED_CACHE_SIDECAR = os.path.join(tempfile.gettempdir(), "agol_gtfs_etag.json")
+
+def _load_sidecar() -> Dict:
+    try:
+        with open(_FEED_CACHE_SIDECAR, "r", encoding="utf-8") as f: return json.load(f)
+    except Exception: return {}
+
+def _save_sidecar(sidecar: Dict):
+    try:
+        with open(_FEED_CACHE_SIDECAR, "w", encoding="utf-8") as f: json.dump(sidecar, f)
+    except Exception as e: print(f"⚠ Could not persist feed cache metadata: {e}")
+
+def _store_feed_cache(sidecar: Dict, url: str, etag, last_modified, df: pd.DataFrame):
+    if not (etag or last_modified): return
+    cache_path = os.path.join(tempfile.gettempdir(), "agol_gtfs_vehicles.pkl")
+    try:
+        df.to_pickle(cache_path)
+        sidecar[url] = {"etag": etag, "last_modified": last_modified, "cache_path": cache_path}
+        _save_sidecar(sidecar)
+    except Exception as e:
+        print(f"⚠ Could not cache parsed feed: {e}")
+
+def _read_feed_cache(meta: Dict):
+    path = meta.get("cache_path")
+    try:
+        if path and os.path.exists(path): return pd.read_pickle(path)
+    except Exception as e:
+        print(f"⚠ Could not read cached feed: {e}")
+    return None
+
+MAX_BACKOFF_S = 30.0
+
+def _is_retriable(e: Exception) -> bool:
+    """Retry 429/5xx and transport errors; give up immediately on other 4xx."""
+    code = getattr(e, "code", None) or getattr(e, "status", None)
+    if code is not None:
+        try: code = int(code)
+        except (TypeError, ValueError): return True
+        return code == 429 or 500 <= code < 600
+    return True  # timeouts, connection resets, DNS failures
+
+def _retry_delay(e: Exception, attempt: int) -> float:
+    """Full-jitter exponential backoff, honoring a server-sent Retry-After."""
+    headers = getattr(e, "headers", None)
+    retry_after = headers.get("Retry-After") if headers is not None else None
+    if retry_after:
+        try: return min(float(retry_after), MAX_BACKOFF_S)
+        except ValueError: pass
+    return random.uniform(0, min(1.5 * (2 ** (attempt - 1)), MAX_BACKOFF_S))
+
+async def afetch_and_parse_gtfs_data(gtfs_url: str, max_retries: int = 4) -> pd.DataFrame:
+    """Async fetch: retries use asyncio.sleep so a running event loop stays responsive."""
+    print(f"Fetching data from: {gtfs_url}")
+    sidecar = _load_sidecar(); meta = sidecar.get(gtfs_url) or {}
+    headers = {"User-Agent": "ArcGIS Online Notebook GTFS-RT Client"}
+    if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
+    attempt = 0
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as session:
+        while True:
+            try:
+                async with session.get(gtfs_url, headers=headers, ssl=_SSL_CTX) as response:
+                    if response.status == 304:
+                        cached = _read_feed_cache(meta)
+                        if cached is not None:
+                            print("Feed unchanged (HTTP 304); reusing cached vehicles.")
+                            return cached
+                        headers.pop("If-None-Match", None); headers.pop("If-Modified-Since", None)
+                        continue
+                    response.raise_for_status()
+                    data = await response.read()
+                    etag, last_mod = response.headers.get("ETag"), response.headers.get("Last-Modified")
+                print("Data fetched successfully.")
+                # Parse in a worker thread so the event loop (and any concurrent
+                # feed fetches) keeps running while protobuf decode burns CPU
+                df = await asyncio.get_running_loop().run_in_executor(None, parse_with_bindings, data)
+                _store_feed_cache(sidecar, gtfs_url, etag, last_mod, df)
+                return df
+            except Exception as e:
+                attempt += 1
+                print(f"Fetch error ({attempt}): {e}")
+                if not _is_retriable(e) or attempt >= max_retries:
+                    print(traceback.format_exc()); return pd.DataFrame(columns=VEHICLE_COLUMNS)
+                await asyncio.sleep(_retry_delay(e, attempt))
+
+def fetch_and_parse_gtfs_data(gtfs_url: str, max_retries: int = 4) -> pd.DataFrame:
+    if aiohttp is not None:
+        try:
+            return asyncio.run(afetch_and_parse_gtfs_data(gtfs_url, max_retries))
+        except RuntimeError:
+            pass  # already inside a running loop (Jupyter) — use the blocking path
+    return _fetch_and_parse_sync(gtfs_url, max_retries)
+
+def _fetch_and_parse_sync(gtfs_url: str, max_retries: int = 4) -> pd.DataFrame:
     print(f"Fetching data from: {gtfs_url}")
-    context = ssl.create_default_context(cafile=certifi.where())
-    request = urllib.request.Request(gtfs_url, headers={"User-Agent": "ArcGIS Online Notebook GTFS-RT Client"})
+    sidecar = _load_sidecar(); meta = sidecar.get(gtfs_url) or {}
+    headers = {"User-Agent": "ArcGIS Online Notebook GTFS-RT Client"}
+    if meta.get("etag"): headers["If-None-Match"] = meta["etag"]
+    if meta.get("last_modified"): headers["If-Modified-Since"] = meta["last_modified"]
     attempt = 0
     while True:
         try:
-            with urllib.request.urlopen(request, context=context, timeout=30) as response:
-                data = response.read()
+            response = _HTTP.request("GET", gtfs_url, headers=headers, timeout=urllib3.Timeout(total=30))
+            if response.status == 304:
+                cached = _read_feed_cache(meta)
+                if cached is not None:
+                    print("Feed unchanged (HTTP 304); reusing cached vehicles.")
+                    return cached
+                # Cached copy is gone — drop the validators and refetch in full.
+                headers.pop("If-None-Match", None); headers.pop("If-Modified-Since", None)
+                continue
+            if response.status >= 400:
+                raise urllib.error.HTTPError(gtfs_url, response.status, "HTTP error", response.headers, None)
+            data = response.data
+            etag, last_mod = response.headers.get("ETag"), response.headers.get("Last-Modified")
             print("Data fetched successfully.")
-            return parse_with_bindings(data)
+            df = parse_with_bindings(data)
+            _store_feed_cache(sidecar, gtfs_url, etag, last_mod, df)
+            return df
         except Exception as e:
             attempt += 1
             print(f"Fetch error ({attempt}): {e}")
-            if attempt >= max_retries:
-                print(traceback.format_exc()); return []
-            time.sleep(1.5 * (2 ** (attempt - 1)))
+            if not _is_retriable(e) or attempt >= max_retries:
+                print(traceback.format_exc()); return pd.DataFrame(columns=VEHICLE_COLUMNS)
+            time.sleep(_retry_delay(e, attempt))
 
 
 # === Validation ===
-def validate_and_filter_positions(vehicles: List[Dict]) -> List[Dict]:
-    valid = []
-    for v in vehicles:
-        lat, lon = v.get("latitude"), v.get("longitude")
-        if lat and lon and lat != 0 and lon != 0:
-            if -36.5 <= lat <= -33.5 and 137.5 <= lon <= 140.5:
-                valid.append(v)
+def validate_and_filter_positions(df: pd.DataFrame) -> pd.DataFrame:
+    if df.empty:
+        print("Valid vehicles in bounds: 0"); return df
+    # One vectorized pass over the (already float64) lat/lon columns
+    lats = df["latitude"].to_numpy(dtype=np.float64)
+    lons = df["longitude"].to_numpy(dtype=np.float64)
+    mask = (np.isfinite(lats) & np.isfinite(lons) & (lats != 0) & (lons != 0)
+            & (lats >= -36.5) & (lats <= -33.5) & (lons >= 137.5) & (lons <= 140.5))
+    valid = df.loc[mask]
     print(f"Valid vehicles in bounds: {len(valid)}")
     return valid
 
-def classify_vehicle_type(route_id: Optional[str]) -> str:
-    if not route_id: return "Unknown"
-    rid = route_id.upper().strip()
-    if rid in {"GLNELG","BTANIC"}: return "Tram"
-    if rid.isalpha(): return "Train"
-    return "Bus"
+# === AGOL Helpers ===
+# Catalog searches are a REST round trip each; cache them briefly so one poll
+# cycle (target lookup + cleanup) pays for at most one query per key.
+_SEARCH_CACHE: Dict = {}
+SEARCH_CACHE_TTL_S = 60.0
 
+def _invalidate_search_cache():
+    _SEARCH_CACHE.clear()
 
-# === AGOL Helpers ===
 def search_owned_exact(gis: GIS, title: str, types: Optional[List[str]]=None):
     owner = gis.users.me.username
+    key = (title, owner, tuple(types) if types else None)
+    hit = _SEARCH_CACHE.get(key)
+    if hit and time.monotonic() - hit[0] < SEARCH_CACHE_TTL_S:
+        return hit[1]
     type_clause = "" if not types else " AND (" + " OR ".join([f'type:\"{t}\"' for t in types]) + ")"
-    return gis.content.search(f'title:\"{title}\" AND owner:\"{owner}\"{type_clause}', max_items=50)
+    items = gis.content.search(f'title:\"{title}\" AND owner:\"{owner}\"{type_clause}', max_items=50)
+    _SEARCH_CACHE[key] = (time.monotonic(), items)
+    return items
 
 def prefer_feature_service(items):
     fs=[i for i in items if i.type=="Feature Service"]
@@ -138,39 +296,169 @@ def get_editable_layer(item):
     except Exception: return None
 
 
-def update_existing_layer(layer_item, vehicles: List[Dict]) -> bool:
+def _edit_features_gzip(fl, batch):
+    """applyEdits with a gzip-compressed request body (~2-3x fewer wire bytes).
+
+    Returns the applyEdits result dict, or None when the portal connection is
+    unavailable or rejects the compressed body, so callers can fall back to
+    the SDK's edit_features serializer."""
+    try:
+        con = getattr(fl, "_con", None) or getattr(getattr(fl, "_gis", None), "_con", None)
+        session, token = getattr(con, "_session", None), getattr(con, "token", None)
+        if session is None or token is None: return None
+        params = {"f": "json", "adds": json.dumps(batch, default=str), "rollbackOnFailure": "false", "token": token}
+        body = gzip.compress(urlencode(params).encode("utf-8"))
+        r = session.post(fl.url + "/applyEdits", data=body, timeout=60,
+                         headers={"Content-Type": "application/x-www-form-urlencoded",
+                                  "Content-Encoding": "gzip", "Accept-Encoding": "gzip, deflate"})
+        result = r.json()
+        return result if isinstance(result, dict) and "addResults" in result else None
+    except Exception:
+        return None
+
+# Feature builders compiled per layer schema: the field map is fixed once the
+# layer is resolved, so exec a builder with the key strings and row attributes
+# baked in as literals instead of looping over the map for every feature.
+_BUILDER_CACHE: Dict = {}
+
+def _compiled_builder(field_map: tuple, want_pts: bool, want_upd: bool, want_vt: bool):
+    key = (field_map, want_pts, want_upd, want_vt)
+    build = _BUILDER_CACHE.get(key)
+    if build is None:
+        parts = [f"{dst!r}: v.{src}" for src, dst in field_map]
+        if want_pts: parts.append("'PositionTimestamp': p_ms")
+        if want_upd: parts.append("'LastUpdated': u_ms")
+        if want_vt: parts.append("'VehicleType': vtype")
+        src_code = ("def build(v, p_ms, u_ms, vtype):\n"
+                    "    return {'geometry': {'x': v.longitude, 'y': v.latitude, 'spatialReference': SR_WGS84},\n"
+                    "            'attributes': {" + ", ".join(parts) + "}}\n")
+        ns = {"SR_WGS84": SR_WGS84}
+        exec(src_code, ns)
+        build = _BUILDER_CACHE[key] = ns["build"]
+    return build
+
+# Delta-sync snapshot of the last successful publish for the current layer:
+# maps VehicleID -> (attrs hash, OBJECTID). GTFS-RT polls typically change a
+# fraction of vehicles, so sending only the difference beats truncate+re-add.
+_SNAPSHOT: Dict = {"url": None, "rows": {}}
+
+def _nan_to_none(v):
+    # hash(nan) is per-object since Python 3.10, so a stray NaN attribute
+    # would make an unchanged vehicle hash differently on every poll
+    return None if isinstance(v, float) and v != v else v
+
+def _feature_hash(f: Dict) -> int:
+    # LastUpdated is ingest time and changes every poll, so it is excluded;
+    # an otherwise-unchanged vehicle keeps its previous row untouched.
+    a = f["attributes"]
+    return hash((f["geometry"]["x"], f["geometry"]["y"])
+                + tuple(sorted((k, _nan_to_none(v)) for k, v in a.items()
+                               if k not in ("OBJECTID", "LastUpdated"))))
+
+def _apply_delta(fl, features: List[Dict]) -> bool:
+    """Send only adds/updates/deletes vs the previous poll. Returns False (and
+    clears the snapshot) whenever a full truncate+add refresh is needed."""
+    snap = _SNAPSHOT
+    if snap["url"] != getattr(fl, "url", None) or not snap["rows"]: return False
+    current: Dict = {}
+    for f in features:
+        vid = f["attributes"].get("VehicleID")
+        if not vid or vid in current: return False  # delta needs unique vehicle ids
+        current[vid] = f
+    prev = snap["rows"]
+    adds, updates, new_rows = [], [], {}
+    for vid, f in current.items():
+        h = _feature_hash(f)
+        if vid not in prev:
+            adds.append((vid, h, f))
+        elif h != prev[vid][0]:
+            updates.append({"geometry": f["geometry"], "attributes": dict(f["attributes"], OBJECTID=prev[vid][1])})
+            new_rows[vid] = (h, prev[vid][1])
+        else:
+            new_rows[vid] = prev[vid]
+    deletes = [prev[vid][1] for vid in prev.keys() - current.keys()]
+    try:
+        # Any failed update/delete means the server no longer matches the
+        # snapshot; bail out so the caller does a full truncate+add refresh
+        for i in range(0, len(updates), MAX_ADD_PER_REQUEST):
+            res = fl.edit_features(updates=updates[i:i + MAX_ADD_PER_REQUEST]) or {}
+            if any(not r.get("success") for r in res.get("updateResults", [])):
+                snap["rows"] = {}; return False
+        if deletes:
+            res = fl.edit_features(deletes=",".join(str(oid) for oid in deletes)) or {}
+            if any(not r.get("success") for r in res.get("deleteResults", [])):
+                snap["rows"] = {}; return False
+        for i in range(0, len(adds), MAX_ADD_PER_REQUEST):
+            part = adds[i:i + MAX_ADD_PER_REQUEST]
+            res = fl.edit_features(adds=[f for _, _, f in part]) or {}
+            for (vid, h, _), r in zip(part, res.get("addResults", [])):
+                if not r.get("success"):
+                    snap["rows"] = {}; return False
+                new_rows[vid] = (h, r.get("objectId"))
+        print(f"Delta sync: {len(adds)} adds, {len(updates)} updates, {len(deletes)} deletes.")
+        snap["rows"] = new_rows
+        return True
+    except Exception as e:
+        print(f"Delta sync failed ({e}); falling back to full refresh.")
+        snap["rows"] = {}
+        return False
+
+def _rebuild_snapshot(fl, features: List[Dict], results: List):
+    oids = [r.get("objectId") for res in results for r in (res or {}).get("addResults", []) if r.get("success")]
+    rows: Dict = {}
+    if len(oids) == len(features):
+        for f, oid in zip(features, oids):
+            vid = f["attributes"].get("VehicleID")
+            if not vid or vid in rows:
+                rows = {}; break
+            rows[vid] = (_feature_hash(f), oid)
+    _SNAPSHOT["url"] = getattr(fl, "url", None); _SNAPSHOT["rows"] = rows
+
+def update_existing_layer(layer_item, df: pd.DataFrame) -> bool:
     try:
         fl = get_editable_layer(layer_item)
         if not fl: return False
         fl_fields = {f["name"] for f in fl.properties.fields}
-        features=[]
-        for v in vehicles:
-            if v.get("latitude") and v.get("longitude"):
-                attrs = {
-                    "VehicleID": v.get("vehicle_id"),
-                    "VehicleLabel": v.get("vehicle_label"),
-                    "LicensePlate": v.get("license_plate"),
-                    "TripID": v.get("trip_id"),
-                    "RouteID": v.get("route_id"),
-                    "DirectionID": v.get("direction_id"),
-                    "StartTime": v.get("start_time"),
-                    "StartDate": v.get("start_date"),
-                    "Bearing": v.get("bearing"),
-                    "Speed": v.get("speed"),
-                    "CurrentStopID": v.get("current_stop_id"),
-                    "PositionTimestamp": to_epoch_ms(v.get("position_timestamp")),
-                    "LastUpdated": to_epoch_ms(v.get("last_updated")),
-                    "VehicleType": classify_vehicle_type(v.get("route_id")),
-                }
-                attrs={k:val for k,val in attrs.items() if k in fl_fields}
-                features.append({
-                    "geometry":{"x":v["longitude"],"y":v["latitude"],"spatialReference":{"wkid":4326}},
-                    "attributes":attrs
-                })
+        # Resolve the layer's fields once so each attrs dict is built with allowed
+        # keys from the start — no second filtering pass per row
+        field_map = [(src, dst) for src, dst in FIELD_MAP if dst in fl_fields]
+        want_pts, want_upd, want_vt = ("PositionTimestamp" in fl_fields), ("LastUpdated" in fl_fields), ("VehicleType" in fl_fields)
+        # position_timestamp_ms is already epoch ms from the parser; only the
+        # ingest time still needs a vectorized datetime->ms conversion.
+        # int-cast per value: the column is float64 (int+None upcast), and a
+        # missing value must reach applyEdits as JSON null, not the invalid
+        # literal NaN
+        pos_ms = [int(v) if pd.notna(v) else None for v in df["position_timestamp_ms"].tolist()]
+        upd_dt = pd.to_datetime(df["last_updated"], utc=True)
+        epoch = pd.Timestamp(0, tz="utc"); one_ms = pd.Timedelta(milliseconds=1)
+        upd_ms = ((upd_dt - epoch) // one_ms).where(upd_dt.notna(), None).tolist()
+        # Vectorized vehicle classification (C string kernels instead of a Python call per row)
+        rid = df["route_id"].fillna("").astype(str).str.upper().str.strip()
+        vtypes = np.select([rid.eq(""), rid.isin(("GLNELG","BTANIC")), rid.str.isalpha()],
+                           ["Unknown","Tram","Train"], default="Bus").tolist()
+        build = _compiled_builder(tuple(field_map), want_pts, want_upd, want_vt)
+        # Replace every remaining NaN/NaT with None before itertuples so the
+        # attribute dicts serialize missing values as null like the old
+        # list-of-dicts path did
+        clean = df.astype(object).where(df.notna(), None)
+        features = [build(v, p_ms, u_ms, vtype)
+                    for v, p_ms, u_ms, vtype in zip(clean.itertuples(index=False), pos_ms, upd_ms, vtypes)
+                    if v.latitude is not None and v.longitude is not None and v.latitude and v.longitude]
+        if _apply_delta(fl, features):
+            print(f"✓ Updated {len(features)} features."); return True
         try: fl.manager.truncate()
         except Exception: fl.delete_features(where="1=1")
-        for batch in chunk(features, MAX_ADD_PER_REQUEST):
-            fl.edit_features(adds=batch)
+        batches = list(chunk(features, MAX_ADD_PER_REQUEST))
+        post = lambda b: _edit_features_gzip(fl, b) or fl.edit_features(adds=b)
+        if len(batches) <= 1:
+            results = [post(b) for b in batches]
+        else:
+            # Batches are independent, so overlap the AGOL round trips
+            with ThreadPoolExecutor(max_workers=4) as ex:
+                results = list(ex.map(post, batches))
+        add_errors = [r for res in results for r in (res or {}).get("addResults", []) if not r.get("success")]
+        if add_errors: print(f"⚠ {len(add_errors)} feature(s) failed to add (first: {add_errors[0]})")
+        _rebuild_snapshot(fl, features, results)
         print(f"✓ Updated {len(features)} features."); return True
     except Exception as e:
         print(f"Update error: {e}"); print(traceback.format_exc()); return False
@@ -212,6 +500,7 @@ def cleanup_old_services(gis: GIS, base_name: str, keep_item_id: str, keep_n: in
         if getattr(it,"protected",False) or it.id in keep_ids: continue
         try: it.delete(); deleted+=1; print(f"Deleted old service: {it.title}")
         except Exception as e: print(f"Could not delete {it.title}: {e}")
+    if deleted: _invalidate_search_cache()
     print(f"✓ Cleanup complete, deleted {deleted} old service(s).") if deleted else print("No old services deleted.")
     if base_items: print(f"Base service(s) preserved: {[it.title for it in base_items]}")
 
@@ -274,12 +563,12 @@ def main():
     args=parse_args()
     gis=GIS("home"); print(f"Connected as: {gis.users.me.username}")
     vehicles=fetch_and_parse_gtfs_data(GTFS_URL); valid=validate_and_filter_positions(vehicles)
-    if not valid: return
+    if valid.empty: return
     owned=search_owned_exact(gis,FEATURE_LAYER_NAME,["Feature Service","Feature Layer"]); target=prefer_feature_service(owned)
     if target:
         if update_existing_layer(target,valid): print(f"Updated existing: {target.title}")
         return
-    service,fl=create_feature_layer_with_schema(gis,FEATURE_LAYER_NAME)
+    service,fl=create_feature_layer_with_schema(gis,FEATURE_LAYER_NAME); _invalidate_search_cache()
     if update_existing_layer(service,valid): print(f"Created + populated: {service.title}")
     if args.no_cleanup: print("⚠ Cleanup skipped (--no-cleanup flag used).")
     else: cleanup_old_services(gis,FEATURE_LAYER_NAME,service.id,keep_n=args.keep_n)
@@ -1,58 +1,188 @@
 # Save this file as proxy_server.py
-import http.server
-import socketserver
+import asyncio
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
 import requests
-from urllib.parse import urlparse
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:  # fall back to the threaded stdlib server below
+    aiohttp = None
+    web = None
 
 # --- Configuration Constants ---
 PORT = 5000
 ADELAIDE_GTFS_URL = "https://gtfs.adelaidemetro.com.au/v1/realtime/vehicle_positions"
 
-class MyHandler(http.server.SimpleHTTPRequestHandler):
+# The upstream feed only refreshes every ~15-30 seconds, so a short cache
+# lets a burst of browser clients share a single upstream fetch.
+CACHE_TTL_S = 10.0
+_cache = {"ts": 0.0, "body": None, "etag": None}
+_cache_lock = asyncio.Lock()
+_sync_cache_lock = threading.Lock()
+
+
+async def _client_session(app):
+    """
+    Create one shared ClientSession for the lifetime of the app.
+    The connection pool keeps the upstream TLS connection open, so
+    overlapping browser requests reuse it instead of handshaking.
+    """
+    app["client"] = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=100, limit_per_host=20),
+        timeout=aiohttp.ClientTimeout(total=30),
+    )
+    yield
+    await app["client"].close()
+
+
+async def _get_feed(client):
+    """
+    Return the feed body, serving from the TTL cache when it is fresh.
+    Only one coroutine fetches at a time; the rest wait on the lock and
+    then find the cache already refreshed. A conditional GET with the
+    stored ETag lets the upstream answer 304 with an empty body when the
+    feed has not changed, costing almost no bandwidth.
+    """
+    if _cache["body"] is not None and time.monotonic() - _cache["ts"] < CACHE_TTL_S:
+        return _cache["body"]
+
+    async with _cache_lock:
+        # Re-check: another coroutine may have refreshed while we waited.
+        if _cache["body"] is not None and time.monotonic() - _cache["ts"] < CACHE_TTL_S:
+            return _cache["body"]
+
+        # Request a gzipped body — the protobuf compresses ~2-3x and
+        # aiohttp decompresses it transparently on read
+        headers = {"Accept-Encoding": "gzip, deflate"}
+        if _cache["etag"]:
+            headers["If-None-Match"] = _cache["etag"]
+        async with client.get(ADELAIDE_GTFS_URL, headers=headers) as upstream:
+            if upstream.status == 304 and _cache["body"] is not None:
+                _cache["ts"] = time.monotonic()
+                return _cache["body"]
+            upstream.raise_for_status()
+            body = await upstream.read()
+            _cache["body"] = body
+            _cache["etag"] = upstream.headers.get("ETag")
+            _cache["ts"] = time.monotonic()
+            return body
+
+
+async def handle_gtfs(request):
+    """
+    Fetch the Adelaide Metro GTFS-RT feed and serve it to the browser.
+    Because the handler is async, many clients can be served concurrently
+    while their upstream fetches overlap on the event loop.
+    """
+    print(f"Request received for {request.path}. Fetching data...")
+    try:
+        body = await _get_feed(request.app["client"])
+    except aiohttp.ClientError as e:
+        print(f"Error fetching data: {e}")
+        raise web.HTTPInternalServerError(text=f"Error: {e}")
+
+    print("Data fetched and served successfully.")
+    # The mimetype for GTFS-RT protobuf data is application/x-protobuf.
+    # The CORS header is crucial for the browser to allow the connection.
+    response = web.Response(
+        body=body,
+        content_type="application/x-protobuf",
+        headers={"Access-Control-Allow-Origin": "*"},
+    )
+    # Gzip the body when the browser accepts it — varint-heavy protobuf
+    # shrinks ~2-3x. Keep-alive is already on with aiohttp's HTTP/1.1.
+    response.enable_compression()
+    return response
+
+
+def _get_feed_sync(session):
+    """
+    Threaded-server counterpart of _get_feed: same TTL cache and upstream
+    conditional GET, guarded by a threading.Lock instead of asyncio.Lock.
+    """
+    if _cache["body"] is not None and time.monotonic() - _cache["ts"] < CACHE_TTL_S:
+        return _cache["body"]
+
+    with _sync_cache_lock:
+        if _cache["body"] is not None and time.monotonic() - _cache["ts"] < CACHE_TTL_S:
+            return _cache["body"]
+
+        headers = {"Accept-Encoding": "gzip, deflate"}
+        if _cache["etag"]:
+            headers["If-None-Match"] = _cache["etag"]
+        response = session.get(ADELAIDE_GTFS_URL, timeout=10, headers=headers)
+        if response.status_code == 304 and _cache["body"] is not None:
+            _cache["ts"] = time.monotonic()
+            return _cache["body"]
+        response.raise_for_status()
+        _cache["body"] = response.content
+        _cache["etag"] = response.headers.get("ETag")
+        _cache["ts"] = time.monotonic()
+        return _cache["body"]
+
+
+def run_threaded_server():
     """
-    A simple proxy handler that fetches data from the Adelaide Metro GTFS-RT API
-    and serves it to the browser.
+    Fallback when aiohttp is not installed. ThreadingHTTPServer runs each
+    handler on its own thread (unlike the old single-threaded TCPServer),
+    so upstream fetches from concurrent clients still overlap.
     """
-    def do_GET(self):
-        # The path from the browser is what comes after the domain.
-        # e.g., for http://localhost:5000/adelaide-gtfs, the path is /adelaide-gtfs
-        if self.path == "/adelaide-gtfs":
+    session = requests.Session()
+
+    class GTFSProxyHandler(BaseHTTPRequestHandler):
+        # HTTP/1.1 keeps the browser's TCP connection open between polls
+        # (BaseHTTPRequestHandler defaults to HTTP/1.0, one connection per
+        # request). Content-Length below is what makes keep-alive work.
+        protocol_version = 'HTTP/1.1'
+
+        def do_GET(self):
+            if self.path != "/adelaide-gtfs":
+                self.send_error(404, "File Not Found")
+                return
             print(f"Request received for {self.path}. Fetching data...")
             try:
-                # Fetch the data from the original API
-                # The timeout prevents the server from hanging indefinitely
-                response = requests.get(ADELAIDE_GTFS_URL, timeout=10)
-                
-                # If the API call fails, raise an error
-                response.raise_for_status() 
-
-                # Set the response headers
-                self.send_response(200)
-                # The mimetype for GTFS-RT protobuf data is application/x-protobuf
-                self.send_header('Content-type', 'application/x-protobuf')
-                # This header is crucial for the browser to allow the connection
-                self.send_header('Access-Control-Allow-Origin', '*') 
-                self.end_headers()
-
-                # Send the content back to the client
-                self.wfile.write(response.content)
-                print("Data fetched and served successfully.")
-            
+                body = _get_feed_sync(session)
             except requests.exceptions.RequestException as e:
                 print(f"Error fetching data: {e}")
                 self.send_error(500, f"Error: {e}")
-        else:
-            # Handle other requests (e.g., requests for favicon)
-            self.send_error(404, "File Not Found")
+                return
+            self.send_response(200)
+            self.send_header('Content-type', 'application/x-protobuf')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            if 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+                body = gzip.compress(body)
+                self.send_header('Content-Encoding', 'gzip')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            print("Data fetched and served successfully.")
+
+    with ThreadingHTTPServer(("", PORT), GTFSProxyHandler) as httpd:
+        httpd.serve_forever()
+
+
+def main():
+    print(f"Starting proxy server on port {PORT}...")
+    print("To use this, open your web browser and navigate to the HTML file.")
+    print("The server will run until you press Ctrl+C.")
+    if aiohttp is None:
+        print("aiohttp not installed - using the threaded stdlib server.")
+        run_threaded_server()
+        return
+    app = web.Application()
+    app.cleanup_ctx.append(_client_session)
+    app.router.add_get("/adelaide-gtfs", handle_gtfs)
+    web.run_app(app, port=PORT, print=None)
+
 
 if __name__ == "__main__":
     try:
-        # Create the server
-        with socketserver.TCPServer(("", PORT), MyHandler) as httpd:
-            print(f"Starting proxy server on port {PORT}...")
-            print("To use this, open your web browser and navigate to the HTML file.")
-            print("The server will run until you press Ctrl+C.")
-            httpd.serve_forever()
+        main()
     except KeyboardInterrupt:
         print("\nShutting down the server.")
     except Exception as e:
@@ -10,7 +10,6 @@ Version 6.0 – Embedded GTFS-RT Protobuf Parser (No AGOL / No Publishing)
 """
 
 import arcpy
-import urllib.request
 import ssl
 import sys
 import os
@@ -18,6 +17,18 @@ import datetime
 import traceback
 import struct
 
+import numpy as np
+import urllib3
+
+# Optional: Numba JIT for the feed-scan kernel. ArcGIS Pro environments do
+# not ship numba by default, so the pure-Python parser below remains the
+# fallback whenever the import fails.
+try:
+    from numba import njit, prange
+except ImportError:
+    njit = None
+    prange = None
+
 # =============================================================================
 # Simple Environment Info (no hard failures)
 # =============================================================================
@@ -55,13 +66,25 @@ except Exception as e:
 #
 # Minimal but complete decoder for GTFS-RT VehiclePosition messages.
 
+# Continuation bits (MSB of each byte) for a maximal 10-byte varint; used to
+# find the terminator of a varint in one mask instead of a per-byte loop.
+_VARINT_CONT_MASK = 0x80808080808080808080
+
+# Precompiled format objects: parsing the "<f"/"<d" format string happens
+# once at import instead of inside every fixed32/fixed64 read.
+_F32 = struct.Struct("<f")
+_F64 = struct.Struct("<d")
+
+
 class _ProtoReader:
     """Low-level reader for Protocol Buffers binary format."""
 
     __slots__ = ("data", "i", "n")
 
-    def __init__(self, data: bytes):
-        self.data = data
+    def __init__(self, data):
+        # A memoryview makes read_bytes an O(1) window instead of a copy;
+        # child readers over submessages share the original feed buffer.
+        self.data = memoryview(data)
         self.i = 0
         self.n = len(data)
 
@@ -76,295 +99,714 @@ class _ProtoReader:
         return start
 
     def read_varint(self) -> int:
-        """Read a protobuf varint (up to 64 bits)."""
+        """Read a protobuf varint (up to 64 bits).
+
+        Prolog: nearly every varint in a GTFS-RT feed is a tag or length
+        below 128 (one byte), occasionally two bytes (direction_id,
+        current_stop_sequence), so those cases return after a single byte
+        compare. The SWAR path below handles the rest (timestamps etc.):
+        load 10 bytes as one little-endian integer, locate the terminating
+        MSB=0 byte with a single bitmask, and extract all 7-bit groups with
+        a fixed shift/mask chain — a few Python ops total instead of a loop
+        iteration per byte.
+        """
+        i = self.i
+        d = self.data
+        n = self.n
+        if i < n:
+            b = d[i]
+            if b < 0x80:
+                self.i = i + 1
+                return b
+            if i + 1 < n:
+                b2 = d[i + 1]
+                if b2 < 0x80:
+                    self.i = i + 2
+                    return (b & 0x7F) | (b2 << 7)
+        if i + 10 <= n:
+            chunk = int.from_bytes(d[i:i + 10], "little")
+            stop = ~chunk & _VARINT_CONT_MASK
+            if not stop:
+                raise ValueError("Varint too long")
+            nb = (stop & -stop).bit_length() >> 3
+            chunk &= (1 << (nb << 3)) - 1
+            self.i = i + nb
+            return ((chunk & 0x7F)
+                    | ((chunk >> 1) & (0x7F << 7))
+                    | ((chunk >> 2) & (0x7F << 14))
+                    | ((chunk >> 3) & (0x7F << 21))
+                    | ((chunk >> 4) & (0x7F << 28))
+                    | ((chunk >> 5) & (0x7F << 35))
+                    | ((chunk >> 6) & (0x7F << 42))
+                    | ((chunk >> 7) & (0x7F << 49))
+                    | ((chunk >> 8) & (0x7F << 56))
+                    | ((chunk >> 9) & (0x7F << 63)))
+
+        # Slow path, only possible within 10 bytes of the end of the buffer
         result = 0
         shift = 0
         while True:
-            if self.i >= self.n:
+            if i >= n:
                 raise ValueError("Truncated varint")
-            b = self.data[self.i]
-            self.i += 1
+            b = d[i]
+            i += 1
             result |= (b & 0x7F) << shift
             if not (b & 0x80):
+                self.i = i
                 return result
             shift += 7
             if shift >= 64:
                 raise ValueError("Varint too long")
 
-    def read_bytes(self, length: int) -> bytes:
-        start = self._require(length)
-        return self.data[start:start + length]
+    def read_bytes(self, length: int) -> memoryview:
+        i = self.i
+        if i + length > self.n:
+            raise ValueError("Truncated protobuf message")
+        self.i = i + length
+        return self.data[i:i + length]
 
     def read_float(self) -> float:
-        start = self._require(4)
-        return struct.unpack("<f", self.data[start:start + 4])[0]
+        i = self.i
+        if i + 4 > self.n:
+            raise ValueError("Truncated protobuf message")
+        self.i = i + 4
+        return _F32.unpack_from(self.data, i)[0]
 
     def read_double(self) -> float:
-        start = self._require(8)
-        return struct.unpack("<d", self.data[start:start + 8])[0]
+        i = self.i
+        if i + 8 > self.n:
+            raise ValueError("Truncated protobuf message")
+        self.i = i + 8
+        return _F64.unpack_from(self.data, i)[0]
 
     def skip_field(self, wire_type: int):
         """Skip a field with the given wire type."""
         if wire_type == 0:        # varint
+            # Same 1/2-byte split as read_varint - no value needed here
+            i = self.i
+            d = self.data
+            n = self.n
+            if i < n:
+                if d[i] < 0x80:
+                    self.i = i + 1
+                    return
+                if i + 1 < n and d[i + 1] < 0x80:
+                    self.i = i + 2
+                    return
             _ = self.read_varint()
         elif wire_type == 1:      # 64-bit
-            _ = self.read_bytes(8)
+            self._require(8)
         elif wire_type == 2:      # length-delimited
-            length = self.read_varint()
-            _ = self.read_bytes(length)
+            # Only advance the cursor - never materialize the skipped
+            # payload (a bundled trip_update submessage can be large)
+            self._require(self.read_varint())
         elif wire_type == 5:      # 32-bit
-            _ = self.read_bytes(4)
+            self._require(4)
         else:
             raise ValueError(f"Unsupported protobuf wire type: {wire_type}")
 
 
-def _parse_trip_descriptor(data: bytes) -> dict:
+class VehicleColumns:
     """
-    Parse TripDescriptor, focusing on:
-      - trip_id (1, string)
-      - start_time (2, string)
-      - start_date (3, string)
-      - route_id (5, string)
-      - direction_id (6, uint32)
+    Struct-of-arrays container for parsed vehicles: one column per field,
+    all the same length. Columnar storage avoids the two dict allocations
+    the old parser made per vehicle and lets downstream code iterate flat
+    arrays (zip over columns) instead of doing per-row key lookups.
+
+    position_timestamp holds raw epoch seconds (int or None) straight
+    from the feed all the way through filtering; the bulk load converts
+    the whole column to datetime64[s] in one vectorized cast.
     """
-    r = _ProtoReader(data)
-    out = {
-        "trip_id": None,
-        "route_id": None,
-        "direction_id": None,
-        "start_time": None,
-        "start_date": None,
-    }
-
-    while not r.eof():
-        tag = r.read_varint()
-        field = tag >> 3
-        wt = tag & 0x07
-
-        if wt == 2 and field in (1, 2, 3, 5):
-            length = r.read_varint()
-            s = r.read_bytes(length).decode("utf-8", "ignore")
-            if field == 1:
-                out["trip_id"] = s
-            elif field == 2:
-                out["start_time"] = s
-            elif field == 3:
-                out["start_date"] = s
-            elif field == 5:
-                out["route_id"] = s
-        elif wt == 0 and field == 6:
-            out["direction_id"] = r.read_varint()
-        else:
-            r.skip_field(wt)
-
-    return out
 
+    FIELDS = (
+        "trip_id", "route_id", "direction_id", "start_time", "start_date",
+        "vehicle_id", "vehicle_label", "license_plate",
+        "latitude", "longitude", "bearing", "speed",
+        "current_stop_id", "position_timestamp", "last_updated",
+    )
 
-def _parse_vehicle_descriptor(data: bytes) -> dict:
+    # _float_scratch collects the raw 4-byte float payloads seen during a
+    # parse so they can be decoded in one vectorized pass at the end,
+    # instead of one struct.unpack call per field.
+    __slots__ = FIELDS + ("_float_scratch",)
+
+    def __init__(self):
+        for name in self.FIELDS:
+            setattr(self, name, [])
+        self._float_scratch = bytearray()
+
+    def __len__(self):
+        return len(self.vehicle_id)
+
+    def reset(self):
+        """Clear every column in place, keeping the allocated storage."""
+        for name in self.FIELDS:
+            getattr(self, name).clear()
+        self._float_scratch.clear()
+
+
+# Parser scratch reused across ticks: clearing lists in place keeps their
+# backing storage warm, so a scheduled refresh loop stops churning ~15
+# column allocations plus their growth reallocations per feed. The columns
+# returned by parse_with_bindings stay valid until the next parse.
+_TICK_COLS = VehicleColumns()
+
+
+# Dispatch tables keyed by the full protobuf tag (field << 3 | wire_type).
+# One dict probe on the tag replaces the if/elif chains that decomposed
+# every tag into (field, wt) and tested each known field in turn — ignored
+# fields (current_stop_sequence, congestion_level, occupancy_status, ...)
+# fall straight through to skip_field.
+
+# TripDescriptor string fields -> slot in
+# (trip_id, route_id, direction_id, start_time, start_date)
+_TRIP_STR_SLOT = {
+    (1 << 3) | 2: 0,   # trip_id
+    (2 << 3) | 2: 3,   # start_time
+    (3 << 3) | 2: 4,   # start_date
+    (5 << 3) | 2: 1,   # route_id
+}
+_TRIP_DIRECTION_TAG = (6 << 3) | 0      # direction_id (uint32)
+
+# VehicleDescriptor string fields -> slot in
+# (vehicle_id, vehicle_label, license_plate)
+_VEHICLE_STR_SLOT = {
+    (1 << 3) | 2: 0,   # id
+    (2 << 3) | 2: 1,   # label
+    (3 << 3) | 2: 2,   # license_plate
+}
+
+# Position float fields -> slot in (latitude, longitude, bearing, speed)
+_POSITION_FLOAT_SLOT = {
+    (1 << 3) | 5: 0,   # latitude
+    (2 << 3) | 5: 1,   # longitude
+    (3 << 3) | 5: 2,   # bearing
+    (5 << 3) | 5: 3,   # speed
+}
+
+
+# Message-level tags used by the fused walker below
+_FEED_ENTITY_TAG = (2 << 3) | 2     # FeedMessage.entity (FeedEntity)
+_ENTITY_VEHICLE_TAG = (4 << 3) | 2  # FeedEntity.vehicle (VehiclePosition)
+_VP_TRIP_TAG = (1 << 3) | 2         # VehiclePosition.trip (TripDescriptor)
+_VP_POSITION_TAG = (2 << 3) | 2     # VehiclePosition.position (Position)
+_VP_TIMESTAMP_TAG = (5 << 3) | 0    # VehiclePosition.timestamp (uint64)
+_VP_STOP_ID_TAG = (7 << 3) | 2      # VehiclePosition.stop_id (string)
+_VP_VEHICLE_TAG = (8 << 3) | 2
+
+# Full tags for the numba kernels, which branch on constants instead of
+# the dict slot tables the interpreted walker uses.
+_NB_TRIP_ID_TAG = (1 << 3) | 2
+_NB_TRIP_START_TIME_TAG = (2 << 3) | 2
+_NB_TRIP_START_DATE_TAG = (3 << 3) | 2
+_NB_TRIP_ROUTE_ID_TAG = (5 << 3) | 2
+_NB_VEH_ID_TAG = (1 << 3) | 2
+_NB_VEH_LABEL_TAG = (2 << 3) | 2
+_NB_VEH_PLATE_TAG = (3 << 3) | 2
+_NB_POS_LAT_TAG = (1 << 3) | 5
+_NB_POS_LON_TAG = (2 << 3) | 5
+_NB_POS_BEARING_TAG = (3 << 3) | 5
+_NB_POS_SPEED_TAG = (5 << 3) | 5      # VehiclePosition.vehicle (VehicleDescriptor)
+
+
+def _parse_feed_message_vehicles(data: bytes, cols=None) -> VehicleColumns:
     """
-    Parse VehicleDescriptor, focusing on:
-      - id (1, string)
-      - label (2, string)
-      - license_plate (3, string)
+    Parse FeedMessage and return all VehiclePositions as VehicleColumns.
+    We ignore the header and any non-vehicle entities. When `cols` is
+    given it is reset and refilled in place instead of allocating fresh
+    columns.
+
+    The whole feed is walked in one flat pass with a single reader:
+    submessage boundaries are tracked as end offsets instead of recursing
+    into a new _ProtoReader over a sliced buffer, so a vehicle costs no
+    intermediate reader or row-merge allocations. Each vehicle is built
+    in a 14-slot row laid out as
+      0-4   trip_id, route_id, direction_id, start_time, start_date
+      5-7   vehicle_id, vehicle_label, license_plate
+      8-11  latitude, longitude, bearing, speed (scratch indices)
+      12    current_stop_id
+      13    timestamp
+    and appended straight into the column arrays.
     """
     r = _ProtoReader(data)
-    out = {
-        "vehicle_id": None,
-        "vehicle_label": None,
-        "license_plate": None,
-    }
-
-    while not r.eof():
-        tag = r.read_varint()
-        field = tag >> 3
-        wt = tag & 0x07
-
-        if wt == 2 and field in (1, 2, 3):
-            length = r.read_varint()
-            s = r.read_bytes(length).decode("utf-8", "ignore")
-            if field == 1:
-                out["vehicle_id"] = s
-            elif field == 2:
-                out["vehicle_label"] = s
-            elif field == 3:
-                out["license_plate"] = s
-        else:
-            r.skip_field(wt)
+    if cols is None:
+        cols = VehicleColumns()
+    else:
+        cols.reset()
+    scratch = cols._float_scratch
+    trip_slot = _TRIP_STR_SLOT
+    vehicle_slot = _VEHICLE_STR_SLOT
+    float_slot = _POSITION_FLOAT_SLOT
+    # Bound-method lookups cost a dict probe per call; hoist them once
+    read_varint = r.read_varint
+    skip_field = r.skip_field
+    require = r._require
+    r_data = r.data
+    n = r.n
+
+    while r.i < n:
+        try:
+            tag = read_varint()
+        except ValueError:
+            break  # defensive break
 
-    return out
+        if tag != _FEED_ENTITY_TAG:
+            # header (FeedHeader) and anything else - skip
+            skip_field(tag & 0x07)
+            continue
 
+        length = read_varint()
+        ent_end = r.i + length
+        while r.i < ent_end:
+            tag = read_varint()
+
+            # FeedEntity fields:
+            #   1 - id (string)
+            #   2 - is_deleted (bool)
+            #   3 - trip_update (TripUpdate, message)
+            #   4 - vehicle (VehiclePosition, message) <-- what we care about
+            #   5 - alert (Alert, message)
+            if tag != _ENTITY_VEHICLE_TAG:
+                skip_field(tag & 0x07)
+                continue
 
-def _parse_position(data: bytes) -> dict:
+            length = read_varint()
+            vp_end = r.i + length
+            vals = [None] * 14
+
+            while r.i < vp_end:
+                tag = read_varint()
+
+                if tag == _VP_TRIP_TAG:
+                    length = read_varint()
+                    sub_end = r.i + length
+                    while r.i < sub_end:
+                        t = read_varint()
+                        slot = trip_slot.get(t)
+                        if slot is not None:
+                            length = read_varint()
+                            start = require(length)
+                            vals[slot] = (start, length)
+                        elif t == _TRIP_DIRECTION_TAG:
+                            vals[2] = read_varint()
+                        else:
+                            skip_field(t & 0x07)
+                    r.i = sub_end
+
+                elif tag == _VP_VEHICLE_TAG:
+                    length = read_varint()
+                    sub_end = r.i + length
+                    while r.i < sub_end:
+                        t = read_varint()
+                        slot = vehicle_slot.get(t)
+                        if slot is not None:
+                            length = read_varint()
+                            start = require(length)
+                            vals[5 + slot] = (start, length)
+                        else:
+                            skip_field(t & 0x07)
+                    r.i = sub_end
+
+                elif tag == _VP_POSITION_TAG:
+                    length = read_varint()
+                    sub_end = r.i + length
+                    while r.i < sub_end:
+                        t = read_varint()
+                        slot = float_slot.get(t)
+                        if slot is not None:
+                            start = require(4)
+                            vals[8 + slot] = len(scratch) >> 2
+                            scratch += r_data[start:start + 4]
+                        else:
+                            skip_field(t & 0x07)
+                    r.i = sub_end
+
+                elif tag == _VP_STOP_ID_TAG:
+                    length = read_varint()
+                    start = require(length)
+                    vals[12] = (start, length)
+
+                elif tag == _VP_TIMESTAMP_TAG:
+                    vals[13] = read_varint()
+
+                else:
+                    # Skip fields we don't use
+                    skip_field(tag & 0x07)
+
+            r.i = vp_end
+
+            (trip_id, route_id, direction_id, start_time, start_date,
+             vehicle_id, vehicle_label, license_plate,
+             latitude, longitude, bearing, speed,
+             current_stop_id, timestamp) = vals
+
+            cols.trip_id.append(trip_id)
+            cols.route_id.append(route_id)
+            cols.direction_id.append(direction_id)
+            cols.start_time.append(start_time)
+            cols.start_date.append(start_date)
+            cols.vehicle_id.append(vehicle_id)
+            cols.vehicle_label.append(vehicle_label)
+            cols.license_plate.append(license_plate)
+            cols.latitude.append(latitude)
+            cols.longitude.append(longitude)
+            cols.bearing.append(bearing)
+            cols.speed.append(speed)
+            cols.current_stop_id.append(current_stop_id)
+            cols.position_timestamp.append(timestamp)
+
+        r.i = ent_end
+
+    _decode_float_columns(cols)
+    _decode_string_columns(cols, r.data)
+    return cols
+
+
+_STRING_COLUMNS = ("trip_id", "route_id", "start_time", "start_date",
+                   "vehicle_id", "vehicle_label", "license_plate",
+                   "current_stop_id")
+
+
+def _decode_string_columns(cols: VehicleColumns, mv):
     """
-    Parse Position:
-      - latitude  (1, float)
-      - longitude (2, float)
-      - bearing   (3, float, optional)
-      - speed     (5, float, optional)
+    Replace the (offset, length) pairs left in the string columns with
+    decoded text. A bytes->str cache means each distinct value is decoded
+    once per feed: route_id has a few dozen distinct values and trip_id
+    repeats across updates, so this does O(distinct) PyUnicode
+    allocations instead of O(vehicles).
     """
-    r = _ProtoReader(data)
-    out = {
-        "latitude": None,
-        "longitude": None,
-        "bearing": None,
-        "speed": None,
-    }
-
-    while not r.eof():
-        tag = r.read_varint()
-        field = tag >> 3
-        wt = tag & 0x07
-
-        if wt == 5 and field == 1:        # float latitude
-            out["latitude"] = r.read_float()
-        elif wt == 5 and field == 2:      # float longitude
-            out["longitude"] = r.read_float()
-        elif wt == 5 and field == 3:      # float bearing
-            out["bearing"] = r.read_float()
-        elif wt == 5 and field == 5:      # float speed
-            out["speed"] = r.read_float()
-        else:
-            r.skip_field(wt)
-
-    return out
+    cache = {}
+    get = cache.get
+    for name in _STRING_COLUMNS:
+        col = getattr(cols, name)
+        for idx, ref in enumerate(col):
+            if ref is None:
+                continue
+            start, length = ref
+            b = bytes(mv[start:start + length])
+            s = get(b)
+            if s is None:
+                s = b.decode("utf-8", "ignore")
+                cache[b] = s
+            col[idx] = s
 
 
-def _parse_vehicle_position(data: bytes) -> dict:
+def _decode_float_columns(cols: VehicleColumns):
     """
-    Parse VehiclePosition, combining:
-      - TripDescriptor     (field 1, message)
-      - Position           (field 2, message)
-      - current_stop_sequence (3, uint32) [ignored here]
-      - timestamp          (5, uint64)
-      - stop_id            (7, string)
-      - VehicleDescriptor  (field 8, message)
+    Replace the scratch indices left in the float columns with decoded
+    values. One np.frombuffer view over the contiguous scratch converts
+    every float in the feed at once (the data is already little-endian),
+    instead of a struct.unpack call per field.
     """
-    r = _ProtoReader(data)
-
-    out = {
-        # Trip fields
-        "trip_id": None,
-        "route_id": None,
-        "direction_id": None,
-        "start_time": None,
-        "start_date": None,
-        # VehicleDescriptor fields
-        "vehicle_id": None,
-        "vehicle_label": None,
-        "license_plate": None,
-        # Position fields
-        "latitude": None,
-        "longitude": None,
-        "bearing": None,
-        "speed": None,
-        # VehiclePosition-level fields
-        "current_stop_id": None,
-        "timestamp": None,
-    }
-
-    while not r.eof():
-        tag = r.read_varint()
-        field = tag >> 3
-        wt = tag & 0x07
-
-        if field == 1 and wt == 2:  # trip (TripDescriptor)
-            length = r.read_varint()
-            sub = r.read_bytes(length)
-            out.update(_parse_trip_descriptor(sub))
-
-        elif field == 8 and wt == 2:  # vehicle (VehicleDescriptor)
-            length = r.read_varint()
-            sub = r.read_bytes(length)
-            out.update(_parse_vehicle_descriptor(sub))
-
-        elif field == 2 and wt == 2:  # position (Position)
-            length = r.read_varint()
-            sub = r.read_bytes(length)
-            out.update(_parse_position(sub))
-
-        elif field == 7 and wt == 2:  # stop_id (string)
-            length = r.read_varint()
-            out["current_stop_id"] = r.read_bytes(length).decode("utf-8", "ignore")
-
-        elif field == 5 and wt == 0:  # timestamp (uint64)
-            out["timestamp"] = r.read_varint()
-
-        else:
-            # Skip fields we don't use
-            r.skip_field(wt)
-
-    return out
+    scratch = cols._float_scratch
+    if not scratch:
+        return
+    decoded = np.frombuffer(scratch, dtype="<f4").tolist()
+    for name in ("latitude", "longitude", "bearing", "speed"):
+        col = getattr(cols, name)
+        col[:] = [decoded[i] if i is not None else None for i in col]
+    scratch.clear()
 
 
-def _parse_feed_entity_vehicle(data: bytes):
+# -----------------------------------------------------------------------------
+# Optional Numba-compiled fast path
+# -----------------------------------------------------------------------------
+#
+# When numba is installed, the whole feed walk runs as a single
+# LLVM-compiled kernel over a uint8 view of the buffer: varint decode,
+# field dispatch and skipping all happen without the Python interpreter.
+# The kernel records numeric values and (offset, length) pairs for strings
+# and floats into preallocated arrays; Python then decodes just the kept
+# fields. Output is identical to the pure-Python walker.
+
+# String slots: trip_id, route_id, start_time, start_date, vehicle_id,
+# vehicle_label, license_plate, current_stop_id
+_NB_STR_FIELDS = ("trip_id", "route_id", "start_time", "start_date",
+                  "vehicle_id", "vehicle_label", "license_plate",
+                  "current_stop_id")
+
+if njit is not None:
+
+    @njit(cache=True, nogil=True)
+    def _read_varint_nb(buf, i, end):
+        result = 0
+        shift = 0
+        while i < end:
+            b = np.int64(buf[i])
+            i += 1
+            result |= (b & 0x7F) << shift
+            if b < 0x80:
+                return result, i
+            shift += 7
+            if shift >= 64:
+                break
+        return -1, end  # truncated / oversized: sentinel for the caller
+
+    @njit(cache=True, nogil=True)
+    def _skip_nb(buf, i, end, wire_type):
+        if wire_type == 0:
+            _, i = _read_varint_nb(buf, i, end)
+            return i
+        if wire_type == 1:
+            return i + 8
+        if wire_type == 2:
+            length, i = _read_varint_nb(buf, i, end)
+            if length < 0:
+                return end
+            return i + length
+        if wire_type == 5:
+            return i + 4
+        return end  # unsupported wire type: abort this scope
+
+    @njit(cache=True, nogil=True)
+    def _parse_vp_nb(buf, i, end, row, flt_off, ivals, str_off, str_len):
+        while i < end:
+            tag, i = _read_varint_nb(buf, i, end)
+            if tag < 0:
+                return end
+
+            if tag == _VP_TRIP_TAG:
+                length, i = _read_varint_nb(buf, i, end)
+                if length < 0 or i + length > end:
+                    return end
+                sub_end = i + length
+                while i < sub_end:
+                    t2, i = _read_varint_nb(buf, i, sub_end)
+                    if t2 < 0:
+                        return end
+                    if t2 == _NB_TRIP_ID_TAG:
+                        l2, i = _read_varint_nb(buf, i, sub_end)
+                        if l2 < 0:
+                            return end
+                        str_off[row, 0] = i
+                        str_len[row, 0] = l2
+                        i += l2
+                    elif t2 == _NB_TRIP_START_TIME_TAG:
+                        l2, i = _read_varint_nb(buf, i, sub_end)
+                        if l2 < 0:
+                            return end
+                        str_off[row, 2] = i
+                        str_len[row, 2] = l2
+                        i += l2
+                    elif t2 == _NB_TRIP_START_DATE_TAG:
+                        l2, i = _read_varint_nb(buf, i, sub_end)
+                        if l2 < 0:
+                            return end
+                        str_off[row, 3] = i
+                        str_len[row, 3] = l2
+                        i += l2
+                    elif t2 == _NB_TRIP_ROUTE_ID_TAG:
+                        l2, i = _read_varint_nb(buf, i, sub_end)
+                        if l2 < 0:
+                            return end
+                        str_off[row, 1] = i
+                        str_len[row, 1] = l2
+                        i += l2
+                    elif t2 == _TRIP_DIRECTION_TAG:
+                        v, i = _read_varint_nb(buf, i, sub_end)
+                        ivals[row, 0] = v
+                    else:
+                        i = _skip_nb(buf, i, sub_end, t2 & 7)
+                i = sub_end
+            elif tag == _VP_VEHICLE_TAG:
+                length, i = _read_varint_nb(buf, i, end)
+                if length < 0 or i + length > end:
+                    return end
+                sub_end = i + length
+                while i < sub_end:
+                    t2, i = _read_varint_nb(buf, i, sub_end)
+                    if t2 < 0:
+                        return end
+                    if t2 == _NB_VEH_ID_TAG or t2 == _NB_VEH_LABEL_TAG or t2 == _NB_VEH_PLATE_TAG:
+                        l2, i = _read_varint_nb(buf, i, sub_end)
+                        if l2 < 0:
+                            return end
+                        str_off[row, 3 + (t2 >> 3)] = i
+                        str_len[row, 3 + (t2 >> 3)] = l2
+                        i += l2
+                    else:
+                        i = _skip_nb(buf, i, sub_end, t2 & 7)
+                i = sub_end
+            elif tag == _VP_POSITION_TAG:
+                length, i = _read_varint_nb(buf, i, end)
+                if length < 0 or i + length > end:
+                    return end
+                sub_end = i + length
+                while i < sub_end:
+                    t2, i = _read_varint_nb(buf, i, sub_end)
+                    if t2 < 0:
+                        return end
+                    if t2 == _NB_POS_LAT_TAG:
+                        if i + 4 > sub_end:
+                            return end
+                        flt_off[row, 0] = i
+                        i += 4
+                    elif t2 == _NB_POS_LON_TAG:
+                        if i + 4 > sub_end:
+                            return end
+                        flt_off[row, 1] = i
+                        i += 4
+                    elif t2 == _NB_POS_BEARING_TAG:
+                        if i + 4 > sub_end:
+                            return end
+                        flt_off[row, 2] = i
+                        i += 4
+                    elif t2 == _NB_POS_SPEED_TAG:
+                        if i + 4 > sub_end:
+                            return end
+                        flt_off[row, 3] = i
+                        i += 4
+                    else:
+                        i = _skip_nb(buf, i, sub_end, t2 & 7)
+                i = sub_end
+            elif tag == _VP_STOP_ID_TAG:
+                length, i = _read_varint_nb(buf, i, end)
+                if length < 0 or i + length > end:
+                    return end
+                str_off[row, 7] = i
+                str_len[row, 7] = length
+                i += length
+            elif tag == _VP_TIMESTAMP_TAG:
+                v, i = _read_varint_nb(buf, i, end)
+                ivals[row, 1] = v
+            else:
+                i = _skip_nb(buf, i, end, tag & 7)
+        return end
+
+    @njit(cache=True, nogil=True)
+    def _scan_vehicle_ranges_nb(buf, starts, ends):
+        """
+        Cheap pre-pass: record the (start, end) byte range of every
+        VehiclePosition submessage without decoding any fields. The
+        ranges are independent, so the real decode can run in parallel.
+        """
+        n = buf.shape[0]
+        cap = starts.shape[0]
+        i = 0
+        count = 0
+        while i < n:
+            tag, i = _read_varint_nb(buf, i, n)
+            if tag < 0:
+                break
+            if tag == _FEED_ENTITY_TAG:
+                length, i = _read_varint_nb(buf, i, n)
+                if length < 0:
+                    break
+                ent_end = i + length
+                if ent_end > n:
+                    break   # truncated feed - drop the partial entity
+                while i < ent_end:
+                    t2, i = _read_varint_nb(buf, i, ent_end)
+                    if t2 < 0:
+                        break
+                    if t2 == _ENTITY_VEHICLE_TAG:
+                        l2, i = _read_varint_nb(buf, i, ent_end)
+                        if l2 < 0 or i + l2 > ent_end:
+                            break
+                        if count >= cap:
+                            return -1   # caller grows the arrays and retries
+                        starts[count] = i
+                        ends[count] = i + l2
+                        count += 1
+                        i += l2
+                    else:
+                        i = _skip_nb(buf, i, ent_end, t2 & 7)
+                i = ent_end
+            else:
+                i = _skip_nb(buf, i, n, tag & 7)
+        return count
+
+    @njit(cache=True, nogil=True, parallel=True)
+    def _parse_entities_nb(buf, starts, ends, flt_off, ivals, str_off, str_len):
+        """Decode all recorded VehiclePosition ranges across all cores."""
+        for k in prange(starts.shape[0]):
+            _parse_vp_nb(buf, starts[k], ends[k], k,
+                         flt_off, ivals, str_off, str_len)
+
+
+def _parse_feed_message_vehicles_nb(feed_data: bytes, cols=None) -> VehicleColumns:
     """
-    Parse a FeedEntity and return a dict representing VehiclePosition
-    if present, otherwise None.
+    Numba fast path producing the same VehicleColumns as
+    _parse_feed_message_vehicles, refilling `cols` in place when given. A sequential pre-pass records the byte
+    range of every VehiclePosition, a parallel kernel decodes those
+    ranges into offset/value arrays across all cores, and only the
+    retained strings and floats are decoded here, column by column.
     """
-    r = _ProtoReader(data)
-    vehicle = None
-
-    while not r.eof():
-        tag = r.read_varint()
-        field = tag >> 3
-        wt = tag & 0x07
-
-        # FeedEntity fields:
-        #   1 - id (string)
-        #   2 - is_deleted (bool)
-        #   3 - trip_update (TripUpdate, message)
-        #   4 - vehicle (VehiclePosition, message) <-- what we care about
-        #   5 - alert (Alert, message)
-        if field == 4 and wt == 2:
-            length = r.read_varint()
-            sub = r.read_bytes(length)
-            vehicle = _parse_vehicle_position(sub)
-        else:
-            r.skip_field(wt)
-
-    return vehicle
+    buf = np.frombuffer(feed_data, dtype=np.uint8)
+    cap = 2048
+    while True:
+        starts = np.zeros(cap, np.int64)
+        ends = np.zeros(cap, np.int64)
+        count = _scan_vehicle_ranges_nb(buf, starts, ends)
+        if count >= 0:
+            break
+        cap *= 2
+
+    # Entities are independent byte ranges: decode them in parallel
+    flt_off = np.full((count, 4), -1, np.int64)
+    ivals = np.full((count, 2), -1, np.int64)
+    str_off = np.full((count, 8), -1, np.int64)
+    str_len = np.zeros((count, 8), np.int64)
+    _parse_entities_nb(buf, starts[:count], ends[:count],
+                       flt_off, ivals, str_off, str_len)
+
+    if cols is None:
+        cols = VehicleColumns()
+    else:
+        cols.reset()
+
+    # Bulk-decode the recorded little-endian float32 offsets per column
+    for col, name in enumerate(("latitude", "longitude", "bearing", "speed")):
+        offs = flt_off[:count, col]
+        vals = [None] * count
+        present = offs >= 0
+        if present.any():
+            gathered = buf[offs[present][:, None] + np.arange(4)]
+            decoded = gathered.reshape(-1, 4).copy().view('<f4').ravel()
+            for k, v in zip(np.flatnonzero(present), decoded.tolist()):
+                vals[k] = v
+        getattr(cols, name).extend(vals)
+
+    cols.direction_id.extend(
+        v if v >= 0 else None for v in ivals[:count, 0].tolist())
+    cols.position_timestamp.extend(
+        v if v >= 0 else None for v in ivals[:count, 1].tolist())
+
+    cache = {}
+    get = cache.get
+    for slot, name in enumerate(_NB_STR_FIELDS):
+        offs = str_off[:count, slot].tolist()
+        lens = str_len[:count, slot].tolist()
+        col = getattr(cols, name)
+        for o, l in zip(offs, lens):
+            if o < 0:
+                col.append(None)
+                continue
+            b = bytes(buf[o:o + l])
+            s = get(b)
+            if s is None:
+                s = b.decode("utf-8", "ignore")
+                cache[b] = s
+            col.append(s)
 
+    return cols
 
-def _parse_feed_message_vehicles(data: bytes):
-    """
-    Parse FeedMessage and return all VehiclePosition dicts.
-    We ignore the header and any non-vehicle entities.
-    """
-    r = _ProtoReader(data)
-    vehicles = []
 
-    while not r.eof():
+def _parse_feed_message_vehicles_best(feed_data: bytes, cols=None):
+    """Use the compiled kernel when numba is available, else pure Python."""
+    if njit is not None:
         try:
-            tag = r.read_varint()
-        except ValueError:
-            break  # defensive break
-
-        field = tag >> 3
-        wt = tag & 0x07
-
-        if field == 1 and wt == 2:
-            # header (FeedHeader) - skip
-            length = r.read_varint()
-            _ = r.read_bytes(length)
-
-        elif field == 2 and wt == 2:
-            # entity (FeedEntity)
-            length = r.read_varint()
-            sub = r.read_bytes(length)
-            v = _parse_feed_entity_vehicle(sub)
-            if v is not None:
-                vehicles.append(v)
-        else:
-            r.skip_field(wt)
+            return _parse_feed_message_vehicles_nb(feed_data, cols)
+        except Exception:
+            pass  # any JIT/typing issue: fall back silently
+    return _parse_feed_message_vehicles(feed_data, cols)
 
-    return vehicles
 
-
-def parse_with_bindings(feed_data: bytes):
+def parse_with_bindings(feed_data: bytes) -> VehicleColumns:
     """
     Replacement for the old gtfs-realtime-bindings-based parser.
 
-    Returns a list of dictionaries, each representing a vehicle with keys:
+    Returns VehicleColumns with one column per field:
       - vehicle_id
       - vehicle_label
       - license_plate
@@ -378,43 +820,15 @@ def parse_with_bindings(feed_data: bytes):
       - bearing
       - speed
       - current_stop_id
-      - position_timestamp (datetime or None)
-      - last_updated      (datetime, now)
+      - position_timestamp (raw epoch seconds or None)
+      - last_updated      (naive UTC datetime, now)
     """
-    raw_vehicles = _parse_feed_message_vehicles(feed_data)
-    now = datetime.datetime.now()
-    vehicles = []
-
-    for vp in raw_vehicles:
-        timestamp = vp.get("timestamp")
-        pos_dt = None
-        if isinstance(timestamp, int):
-            try:
-                pos_dt = datetime.datetime.fromtimestamp(timestamp)
-            except (OverflowError, OSError, ValueError):
-                pos_dt = None
-
-        v = {
-            "vehicle_id": vp.get("vehicle_id"),
-            "vehicle_label": vp.get("vehicle_label"),
-            "license_plate": vp.get("license_plate"),
-            "trip_id": vp.get("trip_id"),
-            "route_id": vp.get("route_id"),
-            "direction_id": vp.get("direction_id"),
-            "start_time": vp.get("start_time"),
-            "start_date": vp.get("start_date"),
-            "latitude": vp.get("latitude"),
-            "longitude": vp.get("longitude"),
-            "bearing": vp.get("bearing"),
-            "speed": vp.get("speed"),
-            "current_stop_id": vp.get("current_stop_id"),
-            "position_timestamp": pos_dt,
-            "last_updated": now,
-        }
-
-        vehicles.append(v)
-
-    return vehicles
+    cols = _parse_feed_message_vehicles_best(feed_data, _TICK_COLS)
+    # Naive UTC to match PositionTimestamp, whose epoch->datetime64 cast is
+    # UTC; numpy's datetime64 columns carry no timezone of their own
+    now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+    cols.last_updated.extend([now] * len(cols))
+    return cols
 
 # =============================================================================
 # Constants (LOCAL ONLY)
@@ -429,16 +843,28 @@ WGS84_SR = arcpy.SpatialReference(4326)
 # GTFS Fetch
 # =============================================================================
 
+# Built once: creating an SSL context reads the system trust store every
+# time, and a pooled connection keeps the TLS session open between ticks
+# instead of a fresh handshake per fetch. The feed compresses well, so ask
+# for gzip (urllib3 decompresses transparently).
+_SSL_CTX = ssl.create_default_context()
+_POOL = urllib3.PoolManager(
+    maxsize=1,
+    ssl_context=_SSL_CTX,
+    headers={
+        "User-Agent": "ArcGIS Pro GTFS-RT Client",
+        "Accept-Encoding": "gzip",
+    },
+)
+
+
 def fetch_and_parse_gtfs_data(url):
     arcpy.AddMessage(f"Fetching data from: {url}")
     try:
-        ctx = ssl.create_default_context()
-        req = urllib.request.Request(
-            url,
-            headers={"User-Agent": "ArcGIS Pro GTFS-RT Client"}
-        )
-        with urllib.request.urlopen(req, context=ctx, timeout=30) as r:
-            data = r.read()
+        resp = _POOL.request("GET", url, timeout=30)
+        if resp.status != 200:
+            raise ValueError(f"HTTP {resp.status} from GTFS-RT feed")
+        data = resp.data
 
         arcpy.AddMessage("Parsing GTFS-RT feed (embedded protobuf parser)...")
         return parse_with_bindings(data)
@@ -446,22 +872,25 @@ def fetch_and_parse_gtfs_data(url):
     except Exception as e:
         arcpy.AddError(f"Error fetching GTFS data: {e}")
         arcpy.AddError(traceback.format_exc())
-        return []
+        return VehicleColumns()
 
 # =============================================================================
 # Spatial Filter
 # =============================================================================
 
-def validate_and_filter_positions(vehicles):
-    valid = []
-    for v in vehicles:
-        lat = v.get("latitude")
-        lon = v.get("longitude")
-        if lat is None or lon is None:
-            continue
-        # Rough Adelaide bounding box
-        if -36.5 <= lat <= -33.5 and 137.5 <= lon <= 140.5:
-            valid.append(v)
+def validate_and_filter_positions(cols: VehicleColumns) -> VehicleColumns:
+    # None (missing position) becomes NaN and fails every comparison
+    lat = np.array(cols.latitude, dtype=np.float64)
+    lon = np.array(cols.longitude, dtype=np.float64)
+
+    # Rough Adelaide bounding box, evaluated as one vectorized mask
+    mask = (lat >= -36.5) & (lat <= -33.5) & (lon >= 137.5) & (lon <= 140.5)
+    keep = np.flatnonzero(mask).tolist()
+
+    valid = VehicleColumns()
+    for name in VehicleColumns.FIELDS:
+        col = getattr(cols, name)
+        setattr(valid, name, [col[k] for k in keep])
 
     arcpy.AddMessage(f"Vehicles inside Adelaide extent: {len(valid)}")
     return valid
@@ -471,6 +900,11 @@ def validate_and_filter_positions(vehicles):
 # =============================================================================
 
 def create_comprehensive_layer(gdb, fc_name, id_field):
+    """
+    Ensure the GDB exists and clear any previous feature class. The FC
+    itself is created by the bulk load in populate_local_feature_class,
+    which derives the field schema from the structured array dtype.
+    """
     out_fc = os.path.join(gdb, fc_name)
 
     if not arcpy.Exists(gdb):
@@ -485,37 +919,6 @@ def create_comprehensive_layer(gdb, fc_name, id_field):
         arcpy.Delete_management(out_fc)
         arcpy.AddWarning(f"Deleted old FC: {out_fc}")
 
-    arcpy.CreateFeatureclass_management(
-        gdb,
-        fc_name,
-        "POINT",
-        spatial_reference=WGS84_SR
-    )
-
-    fields = [
-        (id_field, "TEXT", 50),
-        ("VehicleLabel", "TEXT", 100),
-        ("LicensePlate", "TEXT", 20),
-        ("TripID", "TEXT", 50),
-        ("RouteID", "TEXT", 20),
-        ("DirectionID", "SHORT", None),
-        ("StartTime", "TEXT", 8),
-        ("StartDate", "TEXT", 8),
-        ("Bearing", "FLOAT", None),
-        ("Speed", "FLOAT", None),
-        ("CurrentStopID", "TEXT", 50),
-        ("PositionTimestamp", "DATE", None),
-        ("LastUpdated", "DATE", None),
-    ]
-
-    for name, ftype, length in fields:
-        arcpy.AddField_management(
-            out_fc,
-            name,
-            ftype,
-            field_length=length
-        )
-
     return out_fc
 
 # =============================================================================
@@ -523,53 +926,63 @@ def create_comprehensive_layer(gdb, fc_name, id_field):
 # =============================================================================
 
 def populate_local_feature_class(fc_path, id_field, vehicles):
+    """
+    Bulk-load the vehicle columns into the feature class with a single
+    arcpy.da.NumPyArrayToFeatureClass call instead of an InsertCursor
+    row loop - one Python->ArcObjects transition for the whole feed.
+    """
     arcpy.AddMessage(f"Populating local feature class: {fc_path}")
 
-    fields = [
-        "SHAPE@XY",
-        id_field,
-        "VehicleLabel",
-        "LicensePlate",
-        "TripID",
-        "RouteID",
-        "DirectionID",
-        "StartTime",
-        "StartDate",
-        "Bearing",
-        "Speed",
-        "CurrentStopID",
-        "PositionTimestamp",
-        "LastUpdated",
-    ]
-
-    count = 0
-    with arcpy.da.InsertCursor(fc_path, fields) as cur:
-        for v in vehicles:
-            lat = v.get("latitude")
-            lon = v.get("longitude")
-            if lat is None or lon is None:
-                continue
-
-            row = [
-                (lon, lat),                 # SHAPE@XY
-                v.get("vehicle_id"),        # ID
-                v.get("vehicle_label"),
-                v.get("license_plate"),
-                v.get("trip_id"),
-                v.get("route_id"),
-                v.get("direction_id"),
-                v.get("start_time"),
-                v.get("start_date"),
-                v.get("bearing"),
-                v.get("speed"),
-                v.get("current_stop_id"),
-                v.get("position_timestamp"),
-                v.get("last_updated"),
-            ]
-            cur.insertRow(row)
-            count += 1
-
-    arcpy.AddMessage(f"Inserted {count} vehicle records into {fc_path}")
+    n = len(vehicles)
+    arr = np.empty(n, dtype=[
+        ("XY", "<f8", 2),
+        (id_field, "<U50"),
+        ("VehicleLabel", "<U100"),
+        ("LicensePlate", "<U20"),
+        ("TripID", "<U50"),
+        ("RouteID", "<U20"),
+        ("DirectionID", "<f8"),
+        ("StartTime", "<U8"),
+        ("StartDate", "<U8"),
+        ("Bearing", "<f4"),
+        ("Speed", "<f4"),
+        ("CurrentStopID", "<U50"),
+        ("PositionTimestamp", "<M8[s]"),
+        ("LastUpdated", "<M8[s]"),
+    ])
+
+    # None becomes NaN in the float columns and '' in the text columns
+    lon = np.array(vehicles.longitude, dtype=np.float64)
+    lat = np.array(vehicles.latitude, dtype=np.float64)
+    arr["XY"][:, 0] = lon
+    arr["XY"][:, 1] = lat
+    arr[id_field] = [v or "" for v in vehicles.vehicle_id]
+    arr["VehicleLabel"] = [v or "" for v in vehicles.vehicle_label]
+    arr["LicensePlate"] = [v or "" for v in vehicles.license_plate]
+    arr["TripID"] = [v or "" for v in vehicles.trip_id]
+    arr["RouteID"] = [v or "" for v in vehicles.route_id]
+    arr["DirectionID"] = np.array(vehicles.direction_id, dtype=np.float64)
+    arr["StartTime"] = [v or "" for v in vehicles.start_time]
+    arr["StartDate"] = [v or "" for v in vehicles.start_date]
+    arr["Bearing"] = np.array(vehicles.bearing, dtype=np.float64)
+    arr["Speed"] = np.array(vehicles.speed, dtype=np.float64)
+    arr["CurrentStopID"] = [v or "" for v in vehicles.current_stop_id]
+    # One vectorized epoch->datetime64 cast for the whole column; NaN
+    # (missing) and implausible values both fail the range check -> NaT
+    ts = np.array(vehicles.position_timestamp, dtype=np.float64)
+    has_ts = (ts > 0) & (ts < 2 ** 31)
+    pos_dt = np.full(ts.shape, np.datetime64("NaT"), dtype="<M8[s]")
+    pos_dt[has_ts] = ts[has_ts].astype(np.int64).astype("<M8[s]")
+    arr["PositionTimestamp"] = pos_dt
+    arr["LastUpdated"] = np.array(vehicles.last_updated, dtype="<M8[s]")
+
+    # Drop rows with no usable geometry instead of filtering per row
+    mask = ~np.isnan(lon) & ~np.isnan(lat)
+    arr = arr[mask]
+
+    arcpy.da.NumPyArrayToFeatureClass(arr, fc_path, ("XY",), WGS84_SR)
+
+    arcpy.AddMessage(f"Inserted {len(arr)} vehicle records into {fc_path}")
 
 # =============================================================================
 # Main Execution (Local GDB Only)